@@ -5,13 +5,15 @@ Orchestrates retrieval, generation, and citation extraction using Cohere models
 """
 from typing import List, Dict, Any, Optional
 import time
+import traceback
 
-from app.config.settings import settings
-from app.services.cohere_service import cohere_service
-from app.services.qdrant_service import qdrant_service
+import xxhash
+
+from app.config.settings import get_settings
+from app.services.chunking import chunk_header
+from app.services.cohere_service import get_cohere_service
 from app.agents.retriever import retriever_agent
 from app.agents.selected_text import selected_text_agent
-from app.agents.router import router_agent
 from app.models.chat import ChatRequest, Citation
 
 
@@ -35,12 +37,15 @@ Response Format:
 
 Remember: Your goal is to be accurate and helpful while staying strictly grounded in the provided book content."""
 
+    # Shared, read-only system message reused across requests
+    SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
     FALLBACK_RESPONSE = "I cannot answer this from the book content provided."
 
     def __init__(self) -> None:
         """Initialize RAG agent."""
-        self.chat_model = settings.chat_model
-        self.base_url = settings.cohere_base_url
+        self.chat_model = get_settings().chat_model
+        self.base_url = get_settings().cohere_base_url
 
     async def chat(
         self,
@@ -80,7 +85,6 @@ Remember: Your goal is to be accurate and helpful while staying strictly grounde
 
         except Exception as e:
             print(f"RAG Error: {e}")
-            import traceback
             traceback.print_exc()
             # Return fallback on error
             return {
@@ -114,11 +118,11 @@ Remember: Your goal is to be accurate and helpful while staying strictly grounde
 
         # Generate response
         messages = [
-            {"role": "system", "content": self.SYSTEM_PROMPT},
+            self.SYSTEM_MESSAGE,
             {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {request.query}"},
         ]
 
-        answer = await cohere_service.chat(messages=messages)
+        answer = await get_cohere_service().chat(messages=messages)
 
         # Extract citations
         citations = self._extract_citations(chunks)
@@ -131,51 +135,59 @@ Remember: Your goal is to be accurate and helpful while staying strictly grounde
 
     async def _chat_with_selected_text(self, request: ChatRequest) -> Dict[str, Any]:
         """Chat with selected-text mode."""
-        # Use selected-text agent
         result = await selected_text_agent.answer_with_selected_text(
             query=request.query,
             selected_text=request.selected_text,
             book_id=request.book_id,
             retrieve_additional=True,
+            selected_chunk_id=request.selected_chunk_id,
+        )
+
+        selected_citation = Citation.model_construct(
+            chunk_id="selected",
+            text=request.selected_text[:200] + "..." if len(request.selected_text) > 200 else request.selected_text,
+            source="User Selection",
+            chapter=None,
+            section=None,
+            score=1.0,
+        )
+
+        additional_chunks = self._dedupe_additional_chunks(
+            result["selected_text"], result["additional_chunks"], request.selected_chunk_id
         )
 
         # Build context
         context = result["forced_context"]
 
         # Add additional chunks if available
-        if result["additional_chunks"]:
-            additional_context = "\n\n".join([
-                f"[{ch['source']}] {ch['text']}"
-                for ch in result["additional_chunks"]
-            ])
-            context += f"\n\n[Additional Relevant Content]\n{additional_context}"
+        if additional_chunks:
+            parts = [context, "\n\n[Additional Relevant Content]\n"]
+            for i, ch in enumerate(additional_chunks):
+                if i:
+                    parts.append("\n\n")
+                parts.append("[")
+                parts.append(ch["source"] or "unknown")
+                parts.append("] ")
+                parts.append(ch["text"])
+            context = "".join(parts)
 
         # Generate response
         messages = [
-            {"role": "system", "content": self.SYSTEM_PROMPT},
+            self.SYSTEM_MESSAGE,
             {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {request.query}"},
         ]
 
-        answer = await cohere_service.chat(messages=messages)
+        answer = await get_cohere_service().chat(messages=messages)
 
         # Extract citations (mark selected text specially)
-        citations = [
-            Citation(
-                chunk_id="selected",
-                text=request.selected_text[:200] + "..." if len(request.selected_text) > 200 else request.selected_text,
-                source="User Selection",
-                chapter=None,
-                section=None,
-                score=1.0,
-            )
-        ]
+        citations = [selected_citation]
 
         # Add citations from additional chunks
-        for ch in result["additional_chunks"]:
+        for ch in additional_chunks:
             citations.append(
-                Citation(
+                Citation.model_construct(
                     chunk_id=ch["chunk_id"],
-                    text=ch["text"][:200] + "..." if len(ch["text"]) > 200 else ch["text"],
+                    text=ch.get("text_preview") or (ch["text"][:200] + "..." if len(ch["text"]) > 200 else ch["text"]),
                     source=ch["source"],
                     chapter=ch.get("chapter"),
                     section=ch.get("section"),
@@ -185,29 +197,61 @@ Remember: Your goal is to be accurate and helpful while staying strictly grounde
 
         return {
             "answer": answer,
-            "citations": [c.model_dump() for c in citations],
-            "chunks_retrieved": len(result["additional_chunks"]) + 1,
+            "citations": citations,
+            "chunks_retrieved": len(additional_chunks) + 1,
         }
 
+    def _dedupe_additional_chunks(
+        self,
+        selected_text: str,
+        chunks: List[Dict[str, Any]],
+        selected_chunk_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Drop chunks overlapping the selection or repeated by ID/content."""
+        seen_ids = set()
+        seen_hashes = set()
+        unique = []
+        for ch in chunks:
+            text = ch["text"] or ""
+            content_hash = xxhash.xxh3_64_intdigest(text.encode())
+            # The selection's own chunk contains it, so it only repeats the
+            # forced context; chunks inside the selection add nothing either
+            if (
+                ch["chunk_id"] in seen_ids
+                or content_hash in seen_hashes
+                or ch["chunk_id"] == selected_chunk_id
+                or text in selected_text
+                or selected_text in text
+            ):
+                continue
+
+            seen_ids.add(ch["chunk_id"])
+            seen_hashes.add(content_hash)
+            unique.append(ch)
+
+        return unique
+
     def _build_context(self, chunks: List[Dict[str, Any]]) -> str:
         """Build context string from retrieved chunks."""
-        context_parts = []
-        for i, chunk in enumerate(chunks, 1):
-            source = f"[{chunk.get('source_file', 'unknown')}"
-            if chunk.get("chapter"):
-                source += f" - {chunk['chapter']}"
-            context_parts.append(f"{source}\n{chunk['text']}")
+        # Single join over all pieces; headers are precomputed at ingestion
+        parts = []
+        for chunk in chunks:
+            if parts:
+                parts.append("\n\n")
+            parts.append(chunk.get("header") or chunk_header(chunk.get("source_file"), chunk.get("chapter")))
+            parts.append("\n")
+            parts.append(chunk["text"])
 
-        return "\n\n".join(context_parts)
+        return "".join(parts)
 
     def _extract_citations(self, chunks: List[Dict[str, Any]]) -> List[Citation]:
         """Extract citations from retrieved chunks."""
         citations = []
         for chunk in chunks:
             citations.append(
-                Citation(
+                Citation.model_construct(
                     chunk_id=chunk["chunk_id"],
-                    text=chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"],
+                    text=chunk.get("text_preview") or (chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"]),
                     source=chunk["source_file"],
                     chapter=chunk.get("chapter"),
                     section=chunk.get("section"),
@@ -3,11 +3,25 @@ Retriever agent for Qdrant vector search.
 
 Provides tool/function for retrieving relevant book chunks.
 """
-from typing import List, Dict, Any, Optional
-from qdrant_client.models import PointStruct
+from typing import List, Dict, Any, Optional, TypedDict
 
-from app.services.qdrant_service import qdrant_service
-from app.services.cohere_service import cohere_service
+from app.services.qdrant_service import get_qdrant_service
+from app.services.cohere_service import get_cohere_service
+from app.services.query_cache import QueryCache, get_query_cache
+
+
+class RetrievedChunk(TypedDict):
+    """A retrieved chunk with its payload metadata and similarity score."""
+
+    chunk_id: Optional[str]
+    text: Optional[str]
+    text_preview: Optional[str]
+    source_file: Optional[str]
+    chapter: Optional[str]
+    section: Optional[str]
+    position: Optional[int]
+    header: Optional[str]
+    score: float
 
 
 class RetrieverAgent:
@@ -19,7 +33,7 @@ class RetrieverAgent:
         book_id: Optional[str] = None,
         top_k: int = 5,
         score_threshold: Optional[float] = None,
-    ) -> List[Dict[str, Any]]:
+    ) -> List[RetrievedChunk]:
         """
         Retrieve relevant chunks for a query.
 
@@ -32,28 +46,37 @@ class RetrieverAgent:
         Returns:
             List of retrieved chunks with metadata
         """
-        # Generate query embedding
-        query_embedding = await cohere_service.embed_text(query)
-
-        # Search Qdrant
-        results = await qdrant_service.search(
-            query_vector=query_embedding,
-            limit=top_k,
-            score_threshold=score_threshold,
-            book_id=book_id,
-        )
-
-        # Format results
-        chunks = []
+        # Serve repeated searches from cache
+        cache_key = QueryCache.make_key(query, book_id, top_k, score_threshold)
+        results = get_query_cache().get(cache_key)
+
+        if results is None:
+            # Generate query embedding
+            query_embedding = await get_cohere_service().get_cached_embedding(query)
+
+            # Search Qdrant
+            results = await get_qdrant_service().search(
+                query_vector=query_embedding,
+                limit=top_k,
+                score_threshold=score_threshold,
+                book_id=book_id,
+            )
+            get_query_cache().put(cache_key, book_id, results)
+
+        # Format results (look the payload up once per hit)
+        chunks: List[RetrievedChunk] = []
         for result in results:
+            payload = result.payload
             chunks.append(
                 {
-                    "chunk_id": result.payload.get("chunk_id"),
-                    "text": result.payload.get("text"),
-                    "source_file": result.payload.get("source_file"),
-                    "chapter": result.payload.get("chapter"),
-                    "section": result.payload.get("section"),
-                    "position": result.payload.get("position"),
+                    "chunk_id": payload.get("chunk_id"),
+                    "text": payload.get("text"),
+                    "text_preview": payload.get("text_preview"),
+                    "source_file": payload.get("source_file"),
+                    "chapter": payload.get("chapter"),
+                    "section": payload.get("section"),
+                    "position": payload.get("position"),
+                    "header": payload.get("header"),
                     "score": result.score,
                 }
             )
@@ -25,7 +25,7 @@ class RouterAgent:
             return request.mode
 
         # Auto-detect based on selected_text presence
-        if request.selected_text and request.selected_text.strip():
+        if request.selected_text and not request.selected_text.isspace():
             return "selected_text"
 
         return "full_book"
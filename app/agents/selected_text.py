@@ -4,8 +4,8 @@ Selected-text agent for focused passage Q&A.
 Handles user-selected text passages with highest priority context.
 """
 from typing import List, Dict, Any, Optional
-from app.services.cohere_service import cohere_service
-from app.services.qdrant_service import qdrant_service
+from app.services.cohere_service import get_cohere_service
+from app.services.qdrant_service import get_qdrant_service
 
 
 class SelectedTextAgent:
@@ -17,6 +17,7 @@ class SelectedTextAgent:
         selected_text: str,
         book_id: Optional[str] = None,
         retrieve_additional: bool = False,
+        selected_chunk_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Answer query using selected text as primary context.
@@ -26,6 +27,7 @@ class SelectedTextAgent:
             selected_text: User-selected passage
             book_id: Optional book filter
             retrieve_additional: Whether to retrieve additional chunks
+            selected_chunk_id: Optional ID of the chunk the selection came from
 
         Returns:
             Answer with citations
@@ -38,12 +40,30 @@ class SelectedTextAgent:
 
         # Optionally retrieve additional chunks
         additional_chunks = []
-        if retrieve_additional:
+        neighbor_ids = self._neighbor_chunk_ids(selected_chunk_id) if selected_chunk_id else []
+        if retrieve_additional and neighbor_ids:
+            # Selection came from an indexed chunk: fetch its neighbors
+            # directly instead of embedding + searching (the chunk itself
+            # would only repeat the selection)
+            records = await get_qdrant_service().retrieve_by_chunk_ids(neighbor_ids)
+            records.sort(key=lambda r: r.payload.get("position") or 0)
+
+            additional_chunks = [
+                {
+                    "chunk_id": r.payload.get("chunk_id"),
+                    "text": r.payload.get("text"),
+                    "text_preview": r.payload.get("text_preview"),
+                    "source": r.payload.get("source_file"),
+                    "score": 1.0,
+                }
+                for r in records
+            ]
+        elif retrieve_additional:
             # Embed selected text for similarity search
-            selected_embedding = await cohere_service.embed_text(selected_text)
+            selected_embedding = await get_cohere_service().embed_batcher.submit(selected_text)
 
             # Search for similar chunks
-            results = await qdrant_service.search(
+            results = await get_qdrant_service().search(
                 query_vector=selected_embedding,
                 limit=3,
                 book_id=book_id,
@@ -53,6 +73,7 @@ class SelectedTextAgent:
                 {
                     "chunk_id": r.payload.get("chunk_id"),
                     "text": r.payload.get("text"),
+                    "text_preview": r.payload.get("text_preview"),
                     "source": r.payload.get("source_file"),
                     "score": r.score,
                 }
@@ -66,6 +87,18 @@ class SelectedTextAgent:
             "mode": "selected_text",
         }
 
+    def _neighbor_chunk_ids(self, chunk_id: str) -> List[str]:
+        """Get IDs of a chunk's immediate neighbors (position ± 1), not the chunk itself."""
+        # Chunk IDs are "{book_id}-{index}", assigned sequentially at ingestion
+        prefix, _, index = chunk_id.rpartition("-")
+        if not prefix or not index.isdigit():
+            return []
+
+        position = int(index)
+        return [
+            f"{prefix}-{i}" for i in (position - 1, position + 1) if i >= 0
+        ]
+
 
 # Global selected-text agent instance
 selected_text_agent = SelectedTextAgent()
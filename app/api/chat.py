@@ -3,19 +3,28 @@ Chat API endpoints.
 
 Provides REST API for RAG and simple chat.
 """
-import asyncio
-import json
+import hashlib
 import time
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+import traceback
+from typing import List, Optional
+import orjson
+import xxhash
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
 
 from app.models.chat import ChatRequest, ChatResponse, Citation
-from app.services.cohere_service import cohere_service
-from app.services.qdrant_service import qdrant_service
+from app.services.chunking import chunk_header
+from app.services.cohere_service import get_cohere_service
+from app.services.qdrant_service import get_qdrant_service
+from app.services.query_cache import QueryCache, get_query_cache, get_response_cache
 
 
 router = APIRouter(prefix="/api/v1/chat", tags=["chat"])
 
+# Serializes a whole citation list in one pass for the SSE final event
+_citations_adapter = TypeAdapter(List[Citation])
+
 # RAG system prompt - ensures answers are grounded in retrieved content
 RAG_SYSTEM_PROMPT = """You are a helpful AI assistant that answers questions based on the provided book passages.
 
@@ -40,8 +49,18 @@ Your role is to:
 - Help users with software development, AI, and technical topics
 - If you don't know something specific, be honest about it"""
 
+# System messages are built once and shared by every request; the client
+# only reads them, so they must never be mutated
+RAG_SYSTEM_MESSAGE = {"role": "system", "content": RAG_SYSTEM_PROMPT}
+SIMPLE_SYSTEM_MESSAGE = {"role": "system", "content": SIMPLE_SYSTEM_PROMPT}
+
 
-async def retrieve_context(query: str, book_id: str = None, top_k: int = 5):
+async def retrieve_context(
+    query: str,
+    book_id: str = None,
+    top_k: int = 5,
+    score_threshold: Optional[float] = 0.4,
+) -> list:
     """
     Retrieve relevant chunks from Qdrant for the query.
 
@@ -49,19 +68,27 @@ async def retrieve_context(query: str, book_id: str = None, top_k: int = 5):
         query: User question
         book_id: Optional book filter
         top_k: Number of chunks to retrieve
+        score_threshold: Minimum similarity score, applied by Qdrant
 
     Returns:
         List of retrieved chunks with metadata
     """
-    # Generate query embedding
-    query_embedding = await cohere_service.embed_text(query)
-
-    # Search Qdrant
-    results = await qdrant_service.search(
-        query_vector=query_embedding,
-        limit=top_k,
-        book_id=book_id,
-    )
+    # Serve repeated searches from cache
+    cache_key = QueryCache.make_key(query, book_id, top_k, score_threshold)
+    results = get_query_cache().get(cache_key)
+
+    if results is None:
+        # Generate query embedding
+        query_embedding = await get_cohere_service().get_cached_embedding(query)
+
+        # Search Qdrant
+        results = await get_qdrant_service().search(
+            query_vector=query_embedding,
+            limit=top_k,
+            score_threshold=score_threshold,
+            book_id=book_id,
+        )
+        get_query_cache().put(cache_key, book_id, results)
 
     # Format results into chunks
     chunks = []
@@ -69,9 +96,11 @@ async def retrieve_context(query: str, book_id: str = None, top_k: int = 5):
         chunks.append({
             "chunk_id": result.payload.get("chunk_id"),
             "text": result.payload.get("text"),
+            "text_preview": result.payload.get("text_preview"),
             "source_file": result.payload.get("source_file"),
             "chapter": result.payload.get("chapter"),
             "section": result.payload.get("section"),
+            "header": result.payload.get("header"),
             "score": result.score,
         })
 
@@ -80,14 +109,17 @@ async def retrieve_context(query: str, book_id: str = None, top_k: int = 5):
 
 def build_context(chunks: list) -> str:
     """Build context string from retrieved chunks."""
-    context_parts = []
-    for i, chunk in enumerate(chunks, 1):
-        source = f"[{chunk.get('source_file', 'unknown')}"
-        if chunk.get("chapter"):
-            source += f" - {chunk['chapter']}"
-        context_parts.append(f"{source}\n{chunk['text']}")
+    # Headers are precomputed at ingestion; chunks indexed before that
+    # fall back to building one here
+    parts = []
+    for chunk in chunks:
+        if parts:
+            parts.append("\n\n")
+        parts.append(chunk.get("header") or chunk_header(chunk.get("source_file"), chunk.get("chapter")))
+        parts.append("\n")
+        parts.append(chunk["text"])
 
-    return "\n\n".join(context_parts)
+    return "".join(parts)
 
 
 def extract_citations(chunks: list) -> list:
@@ -95,9 +127,9 @@ def extract_citations(chunks: list) -> list:
     citations = []
     for chunk in chunks:
         citations.append(
-            Citation(
+            Citation.model_construct(
                 chunk_id=chunk["chunk_id"],
-                text=chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"],
+                text=chunk.get("text_preview") or (chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"]),
                 source=chunk["source_file"],
                 chapter=chunk.get("chapter"),
                 section=chunk.get("section"),
@@ -107,99 +139,94 @@ def extract_citations(chunks: list) -> list:
     return citations
 
 
-@router.post("/rag", response_model=ChatResponse)
-async def rag_chat(request: ChatRequest):
+async def prepare_rag_messages(request: ChatRequest):
     """
-    RAG chat endpoint that retrieves relevant book content with fallback to simple chat.
+    Retrieve context for a request and build the prompt messages.
 
-    Uses Qdrant to find relevant passages. If passages are found with high confidence,
-    generates grounded response. Otherwise, falls back to general AI response.
+    Falls back to a simple (ungrounded) prompt when no relevant chunks are found.
+
+    Args:
+        request: Chat request
+
+    Returns:
+        Tuple of (messages, citations, mode)
     """
-    start_time = time.time()
+    # Retrieve relevant chunks; Qdrant drops anything below the relevance
+    # threshold, so only chunks actually relevant to the question come back
+    relevant_chunks = await retrieve_context(
+        query=request.query,
+        book_id=request.book_id,
+        top_k=request.max_chunks or 5,
+        score_threshold=0.4,
+    )
 
-    try:
-        # Retrieve relevant chunks
-        chunks = await retrieve_context(
-            query=request.query,
-            book_id=request.book_id,
-            top_k=request.max_chunks or 5
-        )
+    # If we have relevant chunks, use RAG
+    if relevant_chunks:
+        # Build context from chunks
+        context = build_context(relevant_chunks)
 
-        # Filter chunks by relevance score (e.g., 0.7)
-        # Only use chunks that are actually relevant to the question
-        relevant_chunks = [c for c in chunks if c.get("score", 0) >= 0.4]
-
-        # If we have relevant chunks, use RAG
-        if relevant_chunks:
-            # Build context from chunks
-            context = build_context(relevant_chunks)
-
-            # Generate response with context
-            messages = [
-                {"role": "system", "content": RAG_SYSTEM_PROMPT},
-                {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {request.query}"},
-            ]
-
-            answer = await cohere_service.chat(messages=messages)
-
-            # Extract citations
-            citations = extract_citations(relevant_chunks)
-
-            return ChatResponse(
-                answer=answer,
-                citations=citations,
-                mode="rag",
-                chunks_retrieved=len(relevant_chunks),
-                latency_ms=(time.time() - start_time) * 1000,
-                model_used=cohere_service.chat_model,
-            )
-        
-        # Fallback to simple chat if no relevant context found
         messages = [
-            {"role": "system", "content": SIMPLE_SYSTEM_PROMPT},
-            {"role": "user", "content": request.query},
+            RAG_SYSTEM_MESSAGE,
+            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {request.query}"},
         ]
 
-        answer = await cohere_service.chat(messages=messages)
+        return messages, extract_citations(relevant_chunks), "rag"
 
-        return ChatResponse(
-            answer=answer,
-            citations=[],
-            mode="simple",
-            chunks_retrieved=0,
-            latency_ms=(time.time() - start_time) * 1000,
-            model_used=cohere_service.chat_model,
-        )
+    # Fallback to simple chat if no relevant context found
+    messages = [
+        SIMPLE_SYSTEM_MESSAGE,
+        {"role": "user", "content": request.query},
+    ]
 
-    except Exception as e:
-        print(f"Chat error: {e}")
-        import traceback
-        traceback.print_exc()
+    return messages, [], "simple"
 
-        # Return error response
-        return ChatResponse(
-            answer=f"Sorry, I encountered an error: {str(e)}",
-            citations=[],
-            mode="rag",
-            chunks_retrieved=0,
-            latency_ms=(time.time() - start_time) * 1000,
-            model_used=cohere_service.chat_model,
-        )
 
-    except Exception as e:
-        print(f"RAG Chat error: {e}")
-        import traceback
-        traceback.print_exc()
+async def generate_rag_response(request: ChatRequest, start_time: float) -> ChatResponse:
+    """Run retrieval and generation for a request (raises on failure)."""
+    messages, citations, mode = await prepare_rag_messages(request)
 
-        # Return error response
-        return ChatResponse(
-            answer=f"Sorry, I encountered an error: {str(e)}",
-            citations=[],
-            mode="rag",
-            chunks_retrieved=0,
-            latency_ms=(time.time() - start_time) * 1000,
-            model_used=cohere_service.chat_model,
-        )
+    answer = await get_cohere_service().chat(messages=messages)
+
+    # Response fields are built server-side, so skip re-validating them
+    return ChatResponse.model_construct(
+        answer=answer,
+        citations=citations,
+        mode=mode,
+        chunks_retrieved=len(citations),
+        latency_ms=(time.time() - start_time) * 1000,
+        model_used=get_cohere_service().chat_model,
+    )
+
+
+def rag_error_response(error: Exception, start_time: float) -> ChatResponse:
+    """Log a RAG failure and build the error response."""
+    print(f"Chat error: {error}")
+    traceback.print_exc()
+
+    return ChatResponse.model_construct(
+        answer=f"Sorry, I encountered an error: {str(error)}",
+        citations=[],
+        mode="rag",
+        chunks_retrieved=0,
+        latency_ms=(time.time() - start_time) * 1000,
+        model_used=get_cohere_service().chat_model,
+    )
+
+
+@router.post("/rag", response_model=ChatResponse)
+async def rag_chat(request: ChatRequest):
+    """
+    RAG chat endpoint that retrieves relevant book content with fallback to simple chat.
+
+    Uses Qdrant to find relevant passages. If passages are found with high confidence,
+    generates grounded response. Otherwise, falls back to general AI response.
+    """
+    start_time = time.time()
+
+    try:
+        return await generate_rag_response(request, start_time)
+    except Exception as e:
+        return rag_error_response(e, start_time)
 
 
 @router.post("/simple", response_model=ChatResponse)
@@ -214,47 +241,72 @@ async def simple_chat(request: ChatRequest):
     try:
         # Generate response using Cohere
         messages = [
-            {"role": "system", "content": SIMPLE_SYSTEM_PROMPT},
+            SIMPLE_SYSTEM_MESSAGE,
             {"role": "user", "content": request.query},
         ]
 
-        answer = await cohere_service.chat(messages=messages)
+        answer = await get_cohere_service().chat(messages=messages)
 
         latency_ms = (time.time() - start_time) * 1000
 
-        return ChatResponse(
+        return ChatResponse.model_construct(
             answer=answer,
             citations=[],
             mode="simple",
             chunks_retrieved=0,
             latency_ms=latency_ms,
-            model_used=cohere_service.chat_model,
+            model_used=get_cohere_service().chat_model,
         )
 
     except Exception as e:
         print(f"Simple Chat error: {e}")
-        import traceback
         traceback.print_exc()
 
         # Return error response
-        return ChatResponse(
+        return ChatResponse.model_construct(
             answer=f"Sorry, I encountered an error: {str(e)}",
             citations=[],
             mode="simple",
             chunks_retrieved=0,
             latency_ms=(time.time() - start_time) * 1000,
-            model_used=cohere_service.chat_model,
+            model_used=get_cohere_service().chat_model,
         )
 
 
 @router.post("", response_model=ChatResponse)
-async def chat_unified(request: ChatRequest):
+async def chat_unified(request: ChatRequest, http_request: Request):
     """
     Main chat endpoint (uses RAG mode).
 
-    Routes to RAG chat with book content retrieval.
+    Routes to RAG chat with book content retrieval. Successful responses are
+    cached briefly per request body and tagged with an ETag; a repeat that
+    sends a matching If-None-Match gets 304 Not Modified.
     """
-    return await rag_chat(request)
+    start_time = time.time()
+    # Responses are cached per request body, tagged with the book they were
+    # filtered by so re-ingesting or deleting it drops them
+    cache_key = xxhash.xxh3_64_intdigest(request.model_dump_json().encode())
+
+    cached = get_response_cache().get(cache_key)
+    if cached is None:
+        try:
+            response = await generate_rag_response(request, start_time)
+        except Exception as e:
+            # Errors are returned but never cached
+            return rag_error_response(e, start_time)
+
+        body = response.model_dump_json().encode()
+        # The ETag validates the response body itself, so a regenerated
+        # answer never matches a tag issued for an older one
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        get_response_cache().put(cache_key, request.book_id, (etag, body))
+    else:
+        etag, body = cached
+
+    if etag in [tag.strip() for tag in http_request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.post("/stream")
@@ -265,35 +317,30 @@ async def chat_stream(request: ChatRequest):
     It emits incremental `delta` events followed by a final `final` event
     containing citations and metadata.
 
-    Note: the underlying model call is currently non-streaming; this endpoint
-    simulates streaming by chunking the final answer.
+    Retrieval runs first; model tokens are then forwarded as they are generated.
     """
 
     async def event_generator():
         start_time = time.time()
         try:
-            response: ChatResponse = await rag_chat(request)
+            messages, citations, mode = await prepare_rag_messages(request)
 
-            answer = response.answer or ""
-            chunk_size = 24
-            for i in range(0, len(answer), chunk_size):
-                delta = answer[i : i + chunk_size]
+            async for delta in get_cohere_service().chat_stream(messages=messages):
                 payload = {"type": "delta", "delta": delta}
-                yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
-                await asyncio.sleep(0)
+                yield b"data: " + orjson.dumps(payload) + b"\n\n"
 
             final_payload = {
                 "type": "final",
-                "citations": [c.model_dump() for c in response.citations],
-                "mode": response.mode,
-                "chunks_retrieved": response.chunks_retrieved,
+                "citations": _citations_adapter.dump_python(citations, mode="json"),
+                "mode": mode,
+                "chunks_retrieved": len(citations),
                 "latency_ms": (time.time() - start_time) * 1000,
-                "model_used": response.model_used,
+                "model_used": get_cohere_service().chat_model,
             }
-            yield f"data: {json.dumps(final_payload, ensure_ascii=False)}\n\n"
+            yield b"data: " + orjson.dumps(final_payload) + b"\n\n"
         except Exception as e:
             err_payload = {"type": "error", "message": str(e)}
-            yield f"data: {json.dumps(err_payload, ensure_ascii=False)}\n\n"
+            yield b"data: " + orjson.dumps(err_payload) + b"\n\n"
 
     return StreamingResponse(
         event_generator(),
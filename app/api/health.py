@@ -3,54 +3,72 @@ Health check API endpoints.
 
 Provides service health status and connectivity checks.
 """
+import asyncio
 from fastapi import APIRouter
+
+from app.config.settings import get_settings
 from app.models.health import HealthResponse
-from app.services.qdrant_service import qdrant_service
-from app.services.cohere_service import cohere_service
+from app.services.qdrant_service import get_qdrant_service
+from app.services.cohere_service import get_cohere_service
 from app.db.connection import DatabaseConnection
 
 
 router = APIRouter(prefix="/api/v1", tags=["health"])
 
 
+# Per-dependency probe timeout, so one hung service can't stall the probe
+HEALTH_CHECK_TIMEOUT_SECONDS = 1.0
+
+
+async def _check_qdrant() -> bool:
+    """Check Qdrant collection status."""
+    if not get_qdrant_service().client:
+        return False
+    info = await get_qdrant_service().get_collection_info()
+    return info.get("status") == "ok"
+
+
+async def _check_neon() -> bool:
+    """Check Neon connectivity."""
+    # Opening the pool can take longer than the probe timeout on a cold Neon
+    # compute; start it in the background instead of cancelling it mid-connect
+    if not DatabaseConnection.has_pool():
+        DatabaseConnection.create_pool_in_background()
+        return False
+
+    result = await DatabaseConnection.execute("SELECT 1", fetch="val")
+    return result == 1
+
+
+async def _check_cohere() -> bool:
+    """Check Cohere client configuration."""
+    base_url = get_cohere_service().verify_base_url()
+    return base_url == get_settings().cohere_base_url
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """
     Health check endpoint.
 
-    Returns service connectivity status for all dependencies.
+    Returns service connectivity status for all dependencies. Checks run
+    concurrently, each under its own timeout; a failed or timed-out check
+    reports that dependency as disconnected.
     """
-    from app.config.settings import settings
-
-    # Check Qdrant
-    qdrant_connected = False
-    try:
-        if qdrant_service.client:
-            info = await qdrant_service.get_collection_info()
-            qdrant_connected = info.get("status") == "ok"
-    except Exception as e:
-        qdrant_connected = False
-
-    # Check Neon
-    neon_connected = False
-    try:
-        result = await DatabaseConnection.execute("SELECT 1", fetch="val")
-        neon_connected = result == 1
-    except Exception:
-        neon_connected = False
-
-    # Check Cohere
-    cohere_connected = False
-    try:
-        base_url = cohere_service.verify_base_url()
-        cohere_connected = base_url == settings.cohere_base_url
-    except Exception:
-        cohere_connected = False
+    results = await asyncio.gather(
+        asyncio.wait_for(_check_qdrant(), HEALTH_CHECK_TIMEOUT_SECONDS),
+        asyncio.wait_for(_check_neon(), HEALTH_CHECK_TIMEOUT_SECONDS),
+        asyncio.wait_for(_check_cohere(), HEALTH_CHECK_TIMEOUT_SECONDS),
+        return_exceptions=True,
+    )
+    qdrant_connected, neon_connected, cohere_connected = (
+        result is True for result in results
+    )
 
     return HealthResponse(
         status="healthy" if all([qdrant_connected, neon_connected, cohere_connected]) else "degraded",
         qdrant_connected=qdrant_connected,
         neon_connected=neon_connected,
         cohere_connected=cohere_connected,
-        collection_name=settings.qdrant_collection_name,
+        collection_name=get_settings().qdrant_collection_name,
     )
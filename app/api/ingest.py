@@ -10,7 +10,9 @@ from fastapi.responses import JSONResponse
 
 from app.models.ingest import IngestRequest, IngestResponse
 from app.services.neon_service import neon_service
-from app.services.qdrant_service import qdrant_service
+from app.services.qdrant_service import get_qdrant_service
+from app.services.query_cache import invalidate_book
+from scripts.ingest_book import BookIngestionOrchestrator
 
 
 router = APIRouter(prefix="/api/v1", tags=["ingestion"])
@@ -35,20 +37,20 @@ async def ingest_book(request: IngestRequest, background_tasks: BackgroundTasks)
                 status_code=400, detail=f"Path does not exist: {request.book_path}"
             )
 
-        # Import orchestrator here to avoid circular imports
-        from scripts.ingest_book import BookIngestionOrchestrator
-
         orchestrator = BookIngestionOrchestrator(book_path)
 
         # If book_id provided, delete existing chunks first (idempotent)
         if request.book_id:
-            await qdrant_service.delete_by_book(request.book_id)
+            await get_qdrant_service().delete_by_book(request.book_id)
             await neon_service.delete_book_chunks(request.book_id)
             orchestrator.book_id = request.book_id
 
         # Run ingestion
         result = await orchestrator.ingest()
 
+        # Flush cached searches and answers so new chunks are visible immediately
+        invalidate_book(result["book_id"])
+
         return IngestResponse(**result)
 
     except Exception as e:
@@ -76,6 +78,6 @@ async def list_chunks(
         chunks = await neon_service.get_chunks_by_book(
             book_id, limit=limit, offset=offset
         )
-        return {"chunks": chunks, "count": len(chunks)}
+        return {"chunks": list(map(dict, chunks)), "count": len(chunks)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list chunks: {str(e)}")
@@ -3,7 +3,8 @@ Application configuration using Pydantic BaseSettings.
 
 Loads all environment variables and provides validation.
 """
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Optional
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -31,6 +32,33 @@ class Settings(BaseSettings):
     # Required: Cohere
     cohere_api_key: str = Field(..., description="Cohere API key")
 
+    # Optional: Neon connection pool
+    db_pool_min: int = Field(
+        default=5, ge=0, description="Minimum pooled database connections"
+    )
+    db_pool_max: int = Field(
+        default=40, ge=1, description="Maximum pooled database connections"
+    )
+    db_command_timeout: float = Field(
+        default=60.0, gt=0, description="Database command timeout in seconds"
+    )
+    db_statement_cache_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Prepared statements cached per connection (0 for transaction-mode poolers)",
+    )
+    db_max_inactive_connection_lifetime: float = Field(
+        default=30.0,
+        ge=0,
+        description="Seconds before idle pooled connections are closed (0 = never)",
+    )
+
+    # Optional: Qdrant transport
+    qdrant_prefer_grpc: bool = Field(
+        default=True, description="Use gRPC instead of REST for Qdrant calls"
+    )
+    qdrant_grpc_port: int = Field(default=6334, description="Qdrant gRPC port")
+
     # Optional: Collection name
     qdrant_collection_name: str = Field(
         default="book_chunks", description="Qdrant collection name"
@@ -55,6 +83,47 @@ class Settings(BaseSettings):
         default=50, ge=0, le=500, description="Chunk overlap in tokens"
     )
 
+    # Optional: Caching
+    embedding_cache_size: int = Field(
+        default=1024, ge=1, description="Maximum cached query embeddings"
+    )
+    embedding_cache_ttl_seconds: int = Field(
+        default=600, ge=1, description="Query embedding cache TTL in seconds"
+    )
+    search_cache_size: int = Field(
+        default=2000, ge=1, description="Maximum cached search results"
+    )
+    search_cache_ttl_seconds: int = Field(
+        default=300, ge=1, description="Search result cache TTL in seconds"
+    )
+    response_cache_size: int = Field(
+        default=512, ge=1, description="Maximum cached chat responses"
+    )
+    response_cache_ttl_seconds: int = Field(
+        default=60, ge=1, description="Chat response cache TTL in seconds"
+    )
+    embedding_cache_path: str = Field(
+        default=".cache/embeddings.sqlite3",
+        description="SQLite file caching chunk embeddings across ingestion runs",
+    )
+
+    # Optional: Outbound HTTP connection pooling
+    http_max_connections: int = Field(
+        default=200, ge=1, description="Maximum pooled HTTP connections per client"
+    )
+    http_max_keepalive_connections: int = Field(
+        default=100, ge=0, description="Maximum idle keep-alive HTTP connections per client"
+    )
+    http_timeout_seconds: float = Field(
+        default=60.0, gt=0, description="Outbound HTTP read/write timeout in seconds"
+    )
+    http_connect_timeout_seconds: float = Field(
+        default=10.0, gt=0, description="Outbound HTTP connect timeout in seconds"
+    )
+    http_keepalive_expiry_seconds: float = Field(
+        default=30.0, ge=0, description="Seconds an idle keep-alive connection is kept"
+    )
+
     # Optional: Cohere Compatibility API
     cohere_base_url: str = Field(
         default="https://api.cohere.ai/compatibility/v1",
@@ -85,5 +154,14 @@ class Settings(BaseSettings):
         return v
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the shared settings, loading and validating them on first use."""
+    return Settings()
+
+
+def __getattr__(name: str) -> Any:
+    """Resolve the `settings` global lazily (PEP 562)."""
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,33 +3,79 @@ Async database connection management for Neon Postgres.
 
 Provides connection pool and lifecycle management.
 """
+import asyncio
 import asyncpg
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Optional
+from typing import Any, AsyncGenerator, Iterable, Optional, Sequence
 
-from app.config.settings import settings
+from app.config.settings import get_settings
 
 
 class DatabaseConnection:
     """Async database connection manager."""
 
     _pool: Optional[asyncpg.Pool] = None
+    _pool_lock = asyncio.Lock()
+    _pool_task: Optional[asyncio.Task] = None
 
     @classmethod
     async def create_pool(cls) -> asyncpg.Pool:
         """Create connection pool for Neon Postgres."""
-        if cls._pool is None:
-            cls._pool = await asyncpg.create_pool(
-                settings.neon_database_url,
-                min_size=5,
-                max_size=20,
-                command_timeout=60,
-            )
+        # Concurrent first callers share one pool instead of racing to open two
+        async with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = await cls._open_pool()
         return cls._pool
 
+    @classmethod
+    def has_pool(cls) -> bool:
+        """Whether the connection pool has been created."""
+        return cls._pool is not None
+
+    @classmethod
+    def create_pool_in_background(cls) -> None:
+        """Start creating the pool without waiting, unless it exists or is underway."""
+        if cls._pool is None and (cls._pool_task is None or cls._pool_task.done()):
+            cls._pool_task = asyncio.create_task(cls._create_pool_logged())
+
+    @classmethod
+    async def _create_pool_logged(cls) -> None:
+        """Create the pool, reporting rather than raising failures."""
+        try:
+            await cls.create_pool()
+        except Exception as e:
+            print(f"⚠️  Neon connection pool creation failed: {e}")
+
+    @classmethod
+    async def _open_pool(cls) -> asyncpg.Pool:
+        """Open a new asyncpg pool from settings."""
+        return await asyncpg.create_pool(
+            get_settings().neon_database_url,
+            min_size=get_settings().db_pool_min,
+            max_size=get_settings().db_pool_max,
+            command_timeout=get_settings().db_command_timeout,
+            # Recycle idle connections before Neon's auto-suspend drops them
+            max_inactive_connection_lifetime=get_settings().db_max_inactive_connection_lifetime,
+            init=cls._init_connection,
+            # Keep prepared statements for every query this service issues
+            # on each connection, with no expiry
+            statement_cache_size=get_settings().db_statement_cache_size,
+            max_cached_statement_lifetime=0,
+        )
+
+    @staticmethod
+    async def _init_connection(conn: asyncpg.Connection) -> None:
+        """Configure each new pooled connection."""
+        # Short OLTP queries only pay JIT compilation overhead
+        await conn.execute("SET jit = off")
+
     @classmethod
     async def close_pool(cls) -> None:
         """Close connection pool."""
+        # Let an in-progress background creation finish so its pool is closed too
+        if cls._pool_task is not None:
+            await cls._pool_task
+            cls._pool_task = None
         if cls._pool is not None:
             await cls._pool.close()
             cls._pool = None
@@ -46,18 +92,49 @@ class DatabaseConnection:
     @classmethod
     async def execute(
         cls, query: str, *args, fetch: str = "none"
-    ) -> Optional[list] | Optional[str]:
-        """Execute SQL query with optional fetch."""
+    ) -> Any:
+        """
+        Execute SQL query with optional fetch.
+
+        Rows are returned as asyncpg Records (mapping access via row["col"]);
+        convert to dicts only where a caller actually needs them.
+        """
         async with cls.get_connection() as conn:
             if fetch == "all":
-                result = await conn.fetch(query, *args)
-                return [dict(row) for row in result]
+                return await conn.fetch(query, *args)
             elif fetch == "one":
-                result = await conn.fetchrow(query, *args)
-                return dict(result) if result else None
+                return await conn.fetchrow(query, *args)
             elif fetch == "val":
                 result = await conn.fetchval(query, *args)
                 return result
             else:
                 await conn.execute(query, *args)
                 return None
+
+    @classmethod
+    async def executemany(cls, query: str, args: Iterable[Sequence[Any]]) -> None:
+        """Execute SQL query once per argument row, pipelined in one transaction."""
+        async with cls.get_connection() as conn:
+            async with conn.transaction():
+                await conn.executemany(query, args)
+
+    @classmethod
+    async def copy_and_merge(
+        cls,
+        table: str,
+        columns: Sequence[str],
+        records: Iterable[Sequence[Any]],
+        merge_query: str,
+    ) -> None:
+        """
+        Bulk-load rows into a temporary staging copy of `table` with COPY,
+        then run `merge_query` (which reads from `<table>_stage`) to apply them.
+        """
+        stage = f"{table}_stage"
+        async with cls.get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table(stage, records=records, columns=columns)
+                await conn.execute(merge_query)
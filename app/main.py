@@ -3,6 +3,7 @@ Main FastAPI application.
 
 Entrypoint for the RAG chatbot backend API.
 """
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
@@ -10,52 +11,82 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
-from app.config.settings import settings
-from app.services.qdrant_service import qdrant_service
-from app.services.cohere_service import cohere_service
+from app.config.settings import get_settings
+from app.services.qdrant_service import get_qdrant_service
+from app.services.cohere_service import get_cohere_service
+from app.db.connection import DatabaseConnection
 from app.api import ingest, chat, health
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO if not settings.debug else "DEBUG",
+    level=logging.INFO if not get_settings().debug else "DEBUG",
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
 
+# Upper bound on the startup warm-up, so a slow dependency can't hold up boot
+WARM_UP_TIMEOUT_SECONDS = 5.0
+
+
+async def _warm_up_request() -> None:
+    """Send one synthetic embed + search."""
+    embedding = await get_cohere_service().embed_text("warmup")
+    await get_qdrant_service().search(query_vector=embedding, limit=1)
+
+
+async def warm_up() -> None:
+    """Run one synthetic embed + search so the first real request hits warm connections."""
+    try:
+        await asyncio.wait_for(_warm_up_request(), WARM_UP_TIMEOUT_SECONDS)
+        logger.info("✅ Warm-up embed + search complete")
+    except asyncio.TimeoutError:
+        logger.warning(f"⚠️ Warm-up timed out after {WARM_UP_TIMEOUT_SECONDS}s")
+    except Exception as e:
+        # Warm-up is best effort; a failure here must not block startup
+        logger.warning(f"⚠️ Warm-up failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     logger.info("🚀 Starting RAG Chatbot Backend...")
-    logger.info(f"📦 Qdrant collection: {settings.qdrant_collection_name}")
-    logger.info(f"🤖 Cohere model: {settings.chat_model}")
-    logger.info(f"🔢 Embedding model: {settings.embedding_model}")
+    logger.info(f"📦 Qdrant collection: {get_settings().qdrant_collection_name}")
+    logger.info(f"🤖 Cohere model: {get_settings().chat_model}")
+    logger.info(f"🔢 Embedding model: {get_settings().embedding_model}")
 
     # Initialize services
     try:
-        await qdrant_service.initialize()
+        await get_qdrant_service().initialize()
         logger.info("✅ Qdrant service connected")
 
-        await cohere_service.initialize_async()
+        await get_cohere_service().initialize_async()
         logger.info("✅ Cohere service connected")
     except Exception as e:
         logger.error(f"❌ Service initialization failed: {e}")
         raise
 
+    # Open the Neon pool without holding up startup (a cold compute can take
+    # seconds to resume); health checks report it once it is up
+    DatabaseConnection.create_pool_in_background()
+
+    await warm_up()
+
     yield
 
     # Shutdown
     logger.info("🛑 Shutting down...")
-    from app.db.connection import DatabaseConnection
+    await get_cohere_service().close()
+    await get_qdrant_service().close()
     await DatabaseConnection.close_pool()
     logger.info("✅ Database connection pool closed")
 
 
 # Create FastAPI app
 app = FastAPI(
-    title=settings.app_name,
-    version=settings.app_version,
+    title=get_settings().app_name,
+    version=get_settings().app_version,
     description="Production-grade RAG chatbot backend for published books",
     lifespan=lifespan,
 )
@@ -101,7 +132,7 @@ async def root():
     """Root endpoint."""
     return {
         "message": "RAG Chatbot Backend API",
-        "version": settings.app_version,
+        "version": get_settings().app_version,
         "docs": "/docs",
         "health": "/api/v1/health",
     }
@@ -109,4 +140,4 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=settings.debug)
+    uvicorn.run(app, host="0.0.0.0", port=8000, reload=get_settings().debug)
@@ -25,6 +25,10 @@ class ChatRequest(BaseModel):
         max_length=5000,
         description="Optional selected passage for focused Q&A",
     )
+    selected_chunk_id: Optional[str] = Field(
+        None,
+        description="Optional ID of the indexed chunk the selected text came from",
+    )
     book_id: Optional[str] = Field(None, description="Optional book ID filter")
     mode: Literal["full_book", "selected_text"] = Field(
         default="full_book", description="Chat mode"
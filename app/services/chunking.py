@@ -4,13 +4,57 @@ Text chunking service for book content.
 Implements fixed-size chunking with overlap.
 """
 import re
-from typing import List, Tuple
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
 from dataclasses import dataclass
 
-from app.config.settings import settings
+import tiktoken
 
+from app.config.settings import get_settings
 
-@dataclass
+
+_PARAGRAPH_BREAK_RE = re.compile(r'\n\n+')
+_CHAPTER_RE = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+_SECTION_RE = re.compile(r'^##\s+(.+)$', re.MULTILINE)
+
+def _may_have_header(text: str) -> bool:
+    """Cheap pre-check: markdown headers can only start a line."""
+    return text.startswith("#") or "\n#" in text
+
+
+# BPE encoding used for chunk token accounting
+TOKENIZER_ENCODING = "cl100k_base"
+
+# Ingestion chunks files in worker threads; only one of them loads the encoding
+_encoding_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _load_encoding() -> Optional[tiktoken.Encoding]:
+    """Load the BPE encoding once; None if it can't be loaded (e.g. offline)."""
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(f"⚠️  Tokenizer unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def _get_encoding() -> Optional[tiktoken.Encoding]:
+    """Get the shared BPE encoding, loading it on first use."""
+    with _encoding_lock:
+        return _load_encoding()
+
+
+def chunk_header(source_file: str | None, chapter: str | None) -> str:
+    """Build the "[source - chapter]" header that prefixes a chunk in prompt context."""
+    if chapter:
+        return f"[{source_file or 'unknown'} - {chapter}]"
+    return f"[{source_file or 'unknown'}]"
+
+
+@dataclass(slots=True)
 class Chunk:
     """A text chunk with metadata."""
 
@@ -20,7 +64,6 @@ class Chunk:
     section: str | None
     position: int
     token_count: int
-    embedding: List[float] = None  # Added for ingestion
 
 
 class ChunkingService:
@@ -32,94 +75,190 @@ class ChunkingService:
         chunk_overlap: int = None,
     ):
         """Initialize chunking service."""
-        self.chunk_size = chunk_size or settings.chunk_size
-        self.chunk_overlap = chunk_overlap or settings.chunk_overlap
+        self.chunk_size = chunk_size or get_settings().chunk_size
+        self.chunk_overlap = chunk_overlap or get_settings().chunk_overlap
 
     def chunk_text(
         self,
         text: str,
         source_file: str,
     ) -> List[Chunk]:
-        """Chunk text into overlapping segments."""
-        chunks = []
-        position = 0
+        """Chunk text into overlapping segments in a single pass over paragraphs."""
+        # (text, chapter, section) per chunk; Chunks are built once token counts are known
+        pending: List[Tuple[str, str | None, str | None]] = []
 
-        # Split by paragraphs first for better semantic boundaries
+        # Split by paragraphs first for better semantic boundaries, and
+        # tokenize them all up front
         paragraphs = self._split_into_paragraphs(text)
+        paragraph_tokens = self._count_tokens(paragraphs)
+
+        # Paragraphs (and overlap) of the chunk being built, and its token total
+        parts: List[str] = []
+        token_total = 0
+
+        # Last chunk_overlap words seen so far; every word is at least one
+        # token, so a new chunk's token overlap is always drawn from these
+        tail_words: deque = deque(maxlen=self.chunk_overlap)
+
+        # Headers in effect at the current paragraph, carried across chunks
+        cur_chapter: str | None = None
+        cur_section: str | None = None
+
+        # First headers inside the current chunk, else those in effect at its start
+        chunk_chapter: str | None = None
+        chunk_section: str | None = None
+        start_chapter: str | None = None
+        start_section: str | None = None
+
+        for paragraph, tokens in zip(paragraphs, paragraph_tokens):
+            # Check if adding paragraph exceeds the chunk's token budget
+            # ("\n\n" separator before it is one token)
+            if parts and token_total + 1 + tokens > self.chunk_size:
+                chunk_text = "\n\n".join(parts)
+                pending.append(
+                    (chunk_text, chunk_chapter or start_chapter, chunk_section or start_section)
+                )
 
-        current_chunk = ""
-        current_position = 0
-
-        for paragraph in paragraphs:
-            # Check if adding paragraph exceeds chunk size
-            if len(current_chunk) + len(paragraph) > self.chunk_size:
-                if current_chunk:
-                    # Save current chunk
-                    chunks.append(
-                        Chunk(
-                            text=current_chunk.strip(),
-                            source_file=source_file,
-                            chapter=self._extract_chapter(current_chunk),
-                            section=self._extract_section(current_chunk),
-                            position=current_position,
-                            token_count=self._estimate_tokens(current_chunk),
-                        )
-                    )
-                    current_position += 1
-
-                # Start new chunk with overlap
-                if self.chunk_overlap > 0 and len(chunks) > 0:
-                    overlap_text = self._get_overlap_text(current_chunk)
-                    current_chunk = overlap_text + "\n\n" + paragraph
+                # Start new chunk with up to chunk_overlap tokens of overlap,
+                # unless that would push it over budget
+                overlap_text, overlap_tokens = self._tail_overlap(list(tail_words))
+                if overlap_text and overlap_tokens + 1 + tokens <= self.chunk_size:
+                    parts, token_total = [overlap_text], overlap_tokens
                 else:
-                    current_chunk = paragraph
-            else:
-                # Add paragraph to current chunk
-                current_chunk += "\n\n" + paragraph if current_chunk else paragraph
+                    parts, token_total = [], 0
+                chunk_chapter = chunk_section = None
+                start_chapter, start_section = cur_chapter, cur_section
+
+            # Only scan paragraphs that can hold a header
+            if _may_have_header(paragraph):
+                chapter = self._extract_chapter(paragraph)
+                section = self._extract_section(paragraph)
+                if chapter:
+                    cur_chapter, cur_section = chapter, None
+                    chunk_chapter = chunk_chapter or chapter
+                if section:
+                    cur_section = section
+                    chunk_section = chunk_section or section
+
+            # Add paragraph to current chunk ("\n\n" separator is one token)
+            token_total += tokens + (1 if parts else 0)
+            parts.append(paragraph)
+            if self.chunk_overlap > 0:
+                # Only the paragraph's last chunk_overlap words can reach the
+                # window, so split just that tail instead of the whole paragraph
+                words = paragraph.rsplit(maxsplit=self.chunk_overlap)
+                tail_words.extend(words[1:] if len(words) > self.chunk_overlap else words)
 
         # Don't forget the last chunk
-        if current_chunk.strip():
-            chunks.append(
-                Chunk(
-                    text=current_chunk.strip(),
-                    source_file=source_file,
-                    chapter=self._extract_chapter(current_chunk),
-                    section=self._extract_section(current_chunk),
-                    position=current_position,
-                    token_count=self._estimate_tokens(current_chunk),
-                )
+        if parts:
+            pending.append(
+                ("\n\n".join(parts), chunk_chapter or start_chapter, chunk_section or start_section)
             )
 
-        return chunks
+        # Exact token counts for every finished chunk
+        token_counts = self._count_tokens([chunk_text for chunk_text, _, _ in pending])
+
+        return [
+            Chunk(
+                text=chunk_text,
+                source_file=source_file,
+                chapter=chapter,
+                section=section,
+                position=position,
+                token_count=token_count,
+            )
+            for position, ((chunk_text, chapter, section), token_count) in enumerate(
+                zip(pending, token_counts)
+            )
+        ]
+
+    def _tail_overlap(self, words: List[str]) -> Tuple[str, int]:
+        """Join the trailing words that fit in chunk_overlap tokens, with their count."""
+        # Words tokenize (almost) independently with their leading space, so
+        # per-word counts pick the cut; the joined text is then counted exactly
+        counts = self._count_tokens([" " + word for word in words])
+        start, total = len(words), 0
+        while start and total + counts[start - 1] <= self.chunk_overlap:
+            start -= 1
+            total += counts[start]
+
+        text = " ".join(words[start:])
+        tokens = self._count_text_tokens(text) if text else 0
+        while tokens > self.chunk_overlap:
+            start += 1
+            text = " ".join(words[start:])
+            tokens = self._count_text_tokens(text) if text else 0
+        return text, tokens
 
     def _split_into_paragraphs(self, text: str) -> List[str]:
         """Split text into paragraphs."""
         # Split by double newlines
-        paragraphs = re.split(r'\n\n+', text)
+        paragraphs = _PARAGRAPH_BREAK_RE.split(text)
 
         # Filter out empty paragraphs
-        return [p.strip() for p in paragraphs if p.strip()]
+        return [p for p in (p.strip() for p in paragraphs) if p]
 
     def _extract_chapter(self, text: str) -> str | None:
         """Extract chapter from markdown headers (#)."""
-        match = re.search(r'^#\s+(.+)$', text, re.MULTILINE)
+        # Most text has no header at all; skip the regex engine entirely
+        if not _may_have_header(text):
+            return None
+
+        # Fast path: the header is the first line, no regex scan needed
+        if text.startswith("# "):
+            title = text.partition("\n")[0][2:].strip()
+            if title:
+                return title
+
+        match = _CHAPTER_RE.search(text)
         return match.group(1).strip() if match else None
 
     def _extract_section(self, text: str) -> str | None:
         """Extract section from markdown subheaders (##)."""
-        match = re.search(r'^##\s+(.+)$', text, re.MULTILINE)
+        if not _may_have_header(text):
+            return None
+
+        # Fast path: the subheader is the first line, no regex scan needed
+        if text.startswith("## "):
+            title = text.partition("\n")[0][3:].strip()
+            if title:
+                return title
+
+        match = _SECTION_RE.search(text)
         return match.group(1).strip() if match else None
 
-    def _get_overlap_text(self, text: str) -> str:
-        """Get overlap text from end of chunk."""
-        words = text.split()
-        overlap_words = words[-self.chunk_overlap:] if self.chunk_overlap > 0 else []
-        return " ".join(overlap_words)
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        """Count tokens for many texts with one encoding lookup."""
+        encoding = _get_encoding()
+        if encoding is None:
+            return [self._estimate_tokens(text) for text in texts]
+
+        # Serial on purpose: ingestion already chunks files in worker threads
+        # (encode releases the GIL), so a per-call thread pool would only
+        # oversubscribe the cores
+        return [len(encoding.encode_ordinary(text)) for text in texts]
+
+    def _count_text_tokens(self, text: str) -> int:
+        """Count tokens for a single text."""
+        encoding = _get_encoding()
+        if encoding is None:
+            return self._estimate_tokens(text)
+
+        return len(encoding.encode_ordinary(text))
 
     def _estimate_tokens(self, text: str) -> int:
         """Estimate token count (rough approximation: 1 token ≈ 4 characters)."""
         return len(text) // 4
 
 
-# Global chunking service instance
-chunking_service = ChunkingService()
+@lru_cache(maxsize=1)
+def get_chunking_service() -> ChunkingService:
+    """Get the shared chunking service instance, creating it on first use."""
+    return ChunkingService()
+
+
+def __getattr__(attr: str) -> Any:
+    """Resolve the `chunking_service` global lazily (PEP 562)."""
+    if attr == "chunking_service":
+        return get_chunking_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
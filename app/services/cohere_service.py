@@ -3,10 +3,16 @@ Cohere embedding and chat service.
 
 Uses OpenAI SDK with Cohere's OpenAI Compatibility API.
 """
-from typing import List, Optional
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+import xxhash
+from cachetools import TTLCache
 from openai import AsyncOpenAI, OpenAI
 
-from app.config.settings import settings
+from app.config.settings import get_settings
+from app.services.embed_batcher import EmbedBatcher
+from app.services.query_cache import normalize_query
 
 
 class CohereService:
@@ -16,25 +22,61 @@ class CohereService:
         """Initialize Cohere-compatible OpenAI client."""
         self.sync_client: Optional[OpenAI] = None
         self.async_client: Optional[AsyncOpenAI] = None
-        self.embedding_model = settings.embedding_model
-        self.chat_model = settings.chat_model
-        self.base_url = settings.cohere_base_url
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.embedding_model = get_settings().embedding_model
+        self.chat_model = get_settings().chat_model
+        self.base_url = get_settings().cohere_base_url
+
+        # LRU + TTL cache for query embeddings, keyed on hash of (model, normalized text)
+        self._embedding_cache: TTLCache = TTLCache(
+            maxsize=get_settings().embedding_cache_size,
+            ttl=get_settings().embedding_cache_ttl_seconds,
+        )
+
+        # Coalesces concurrent single-text embeds into batched requests
+        self.embed_batcher = EmbedBatcher(self.embed_batch)
 
     def initialize(self) -> None:
         """Initialize synchronous Cohere client."""
         self.sync_client = OpenAI(
-            api_key=settings.cohere_api_key,
+            api_key=get_settings().cohere_api_key,
             base_url=self.base_url,
         )
         print(f"✅ Cohere client initialized: {self.base_url}")
 
     async def initialize_async(self) -> None:
         """Initialize asynchronous Cohere client."""
+        # One pooled HTTP/2 client for the process lifetime, so requests reuse
+        # warm keep-alive connections instead of paying TCP + TLS setup
+        if self.http_client is None:
+            settings = get_settings()
+            self.http_client = httpx.AsyncClient(
+                http2=True,
+                # Generous read timeout for long chat completions; fail fast on connect
+                timeout=httpx.Timeout(
+                    settings.http_timeout_seconds,
+                    connect=settings.http_connect_timeout_seconds,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive_connections,
+                    keepalive_expiry=settings.http_keepalive_expiry_seconds,
+                ),
+            )
+
         self.async_client = AsyncOpenAI(
-            api_key=settings.cohere_api_key,
+            api_key=get_settings().cohere_api_key,
             base_url=self.base_url,
+            http_client=self.http_client,
         )
 
+    async def close(self) -> None:
+        """Close the pooled HTTP client."""
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+            self.async_client = None
+
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding for text."""
         if self.async_client is None:
@@ -52,13 +94,31 @@ class CohereService:
         if self.async_client is None:
             await self.initialize_async()
 
+        # Send each distinct text once, then map results back to input order
+        unique: Dict[str, int] = {}
+        positions = [unique.setdefault(text, len(unique)) for text in texts]
+
         # Cohere supports batch embedding
         response = await self.async_client.embeddings.create(
             model=self.embedding_model,
-            input=texts,
+            input=list(unique),
         )
 
-        return [item.embedding for item in response.data]
+        embeddings = [item.embedding for item in response.data]
+        return [embeddings[position] for position in positions]
+
+    async def get_cached_embedding(self, text: str) -> List[float]:
+        """Generate embedding for a query, serving repeated queries from cache."""
+        key = xxhash.xxh3_64_intdigest(f"{self.embedding_model}|{normalize_query(text)}".encode())
+
+        # Cache reads/writes never straddle an await, so the event loop keeps
+        # them consistent without a lock; concurrent misses just embed twice.
+        embedding = self._embedding_cache.get(key)
+        if embedding is None:
+            embedding = await self.embed_batcher.submit(text)
+            self._embedding_cache[key] = embedding
+
+        return embedding
 
     async def embed_query(self, query: str) -> List[float]:
         """Generate embedding for search query (alias for embed_text)."""
@@ -83,6 +143,28 @@ class CohereService:
 
         return response.choices[0].message.content
 
+    async def chat_stream(
+        self,
+        messages: List[dict],
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+    ) -> AsyncIterator[str]:
+        """Stream chat response text deltas as they are generated."""
+        if self.async_client is None:
+            await self.initialize_async()
+
+        stream = await self.async_client.chat.completions.create(
+            model=self.chat_model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
     def verify_base_url(self) -> str:
         """Verify Cohere base URL is set correctly."""
         if self.sync_client is None:
@@ -91,5 +173,14 @@ class CohereService:
         return self.sync_client.base_url
 
 
-# Global Cohere service instance
-cohere_service = CohereService()
+@lru_cache(maxsize=1)
+def get_cohere_service() -> CohereService:
+    """Get the shared Cohere service instance, creating it on first use."""
+    return CohereService()
+
+
+def __getattr__(attr: str) -> Any:
+    """Resolve the `cohere_service` global lazily (PEP 562)."""
+    if attr == "cohere_service":
+        return get_cohere_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
@@ -0,0 +1,86 @@
+"""
+Persistent embedding cache for ingestion.
+
+Stores chunk embeddings in SQLite keyed on a content hash, so re-ingesting
+unchanged content skips the embedding API entirely. Methods block on disk I/O;
+async callers run them through asyncio.to_thread.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+
+
+class EmbeddingCache:
+    """SQLite-backed content hash -> float32 embedding store."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize embedding cache (the database is opened on first use)."""
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # Calls arrive from worker threads; one at a time per connection
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the cache table if needed."""
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb_cache (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+            )
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        """Build cache key from embedding model and exact chunk text."""
+        return hashlib.sha256(f"{model}|{text}".encode()).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Get cached embeddings for the keys that are present."""
+        if not keys:
+            return {}
+
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT hash, vec FROM emb_cache WHERE hash IN ({placeholders})", keys
+            ).fetchall()
+        return {key: np.frombuffer(vec, dtype=np.float32) for key, vec in rows}
+
+    def put_many(self, items: Iterable[Tuple[bytes, np.ndarray]]) -> None:
+        """Store embeddings, keeping any existing entry for a key."""
+        rows = [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO emb_cache (hash, vec) VALUES (?, ?)", rows
+                )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the shared embedding cache instance, creating it on first use."""
+    return EmbeddingCache(get_settings().embedding_cache_path)
+
+
+def __getattr__(attr: str) -> Any:
+    """Resolve the `embedding_cache` global lazily (PEP 562)."""
+    if attr == "embedding_cache":
+        return get_embedding_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
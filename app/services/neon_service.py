@@ -3,10 +3,46 @@ Neon Postgres service for metadata persistence.
 
 Provides CRUD operations for chunk metadata.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Optional, Sequence, Tuple
+import asyncpg
 from app.db.connection import DatabaseConnection
 
 
+# (chunk_id, book_id, source_file, chapter, section, position, text, token_count)
+ChunkMetadataRow = Tuple[str, str, str, Optional[str], Optional[str], int, str, int]
+
+UPSERT_CHUNK_METADATA_QUERY = """
+    INSERT INTO chunks_metadata
+    (chunk_id, book_id, source_file, chapter, section, position, text, token_count)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+    ON CONFLICT (chunk_id) DO UPDATE SET
+        text = EXCLUDED.text,
+        chapter = EXCLUDED.chapter,
+        section = EXCLUDED.section,
+        position = EXCLUDED.position
+"""
+
+
+CHUNK_METADATA_COLUMNS = (
+    "chunk_id", "book_id", "source_file", "chapter", "section", "position", "text", "token_count",
+)
+
+MERGE_CHUNK_METADATA_STAGE_QUERY = """
+    INSERT INTO chunks_metadata
+    (chunk_id, book_id, source_file, chapter, section, position, text, token_count)
+    SELECT chunk_id, book_id, source_file, chapter, section, position, text, token_count
+    FROM chunks_metadata_stage
+    ON CONFLICT (chunk_id) DO UPDATE SET
+        text = EXCLUDED.text,
+        chapter = EXCLUDED.chapter,
+        section = EXCLUDED.section,
+        position = EXCLUDED.position
+"""
+
+# Batches at least this large are loaded with COPY instead of executemany
+COPY_MIN_ROWS = 1000
+
+
 class NeonService:
     """Neon Postgres service wrapper."""
 
@@ -22,19 +58,8 @@ class NeonService:
         token_count: int,
     ) -> None:
         """Upsert chunk metadata to database."""
-        query = """
-            INSERT INTO chunks_metadata
-            (chunk_id, book_id, source_file, chapter, section, position, text, token_count)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            ON CONFLICT (chunk_id) DO UPDATE SET
-                text = EXCLUDED.text,
-                chapter = EXCLUDED.chapter,
-                section = EXCLUDED.section,
-                position = EXCLUDED.position
-        """
-
         await DatabaseConnection.execute(
-            query,
+            UPSERT_CHUNK_METADATA_QUERY,
             chunk_id,
             book_id,
             source_file,
@@ -45,9 +70,26 @@ class NeonService:
             token_count,
         )
 
+    async def upsert_chunk_metadata_bulk(self, rows: Sequence[ChunkMetadataRow]) -> None:
+        """Upsert many chunk metadata rows in a single batched round-trip."""
+        if not rows:
+            return
+
+        # Large books stream through COPY into a staging table and merge with
+        # one INSERT ... SELECT, avoiding per-row statement execution
+        if len(rows) >= COPY_MIN_ROWS:
+            await DatabaseConnection.copy_and_merge(
+                "chunks_metadata",
+                CHUNK_METADATA_COLUMNS,
+                rows,
+                MERGE_CHUNK_METADATA_STAGE_QUERY,
+            )
+        else:
+            await DatabaseConnection.executemany(UPSERT_CHUNK_METADATA_QUERY, rows)
+
     async def get_chunk_metadata(
         self, chunk_id: str
-    ) -> Optional[Dict[str, Any]]:
+    ) -> Optional[asyncpg.Record]:
         """Get metadata for a specific chunk."""
         query = """
             SELECT chunk_id, book_id, source_file, chapter, section, position, text, token_count, created_at
@@ -59,7 +101,7 @@ class NeonService:
 
     async def get_chunks_by_book(
         self, book_id: str, limit: int = 100, offset: int = 0
-    ) -> List[Dict[str, Any]]:
+    ) -> List[asyncpg.Record]:
         """Get all chunks for a book."""
         query = """
             SELECT chunk_id, book_id, source_file, chapter, section, position, created_at
@@ -74,17 +116,16 @@ class NeonService:
         )
 
     async def delete_book_chunks(self, book_id: str) -> int:
-        """Delete all chunks for a book."""
-        query = "DELETE FROM chunks_metadata WHERE book_id = $1"
-
-        # First get count
-        count_query = "SELECT COUNT(*) FROM chunks_metadata WHERE book_id = $1"
-        count = await DatabaseConnection.execute(count_query, book_id, fetch="val")
-
-        # Then delete
-        await DatabaseConnection.execute(query, book_id)
+        """Delete all chunks for a book and return how many were deleted."""
+        # Delete and count in one statement, so the count matches what was removed
+        query = """
+            WITH deleted AS (
+                DELETE FROM chunks_metadata WHERE book_id = $1 RETURNING 1
+            )
+            SELECT COUNT(*) FROM deleted
+        """
 
-        return count
+        return await DatabaseConnection.execute(query, book_id, fetch="val")
 
 
 # Global Neon service instance
@@ -3,18 +3,48 @@ Qdrant vector database service.
 
 Provides Qdrant client initialization and collection management.
 """
+import asyncio
+import uuid
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
-from qdrant_client import QdrantClient
+import httpx
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.models import (
     Distance,
     PointStruct,
+    Record,
     VectorParams,
     Filter,
     FieldCondition,
     MatchValue,
+    HnswConfigDiff,
+    OptimizersConfigDiff,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
 )
 
-from app.config.settings import settings
+from app.config.settings import get_settings
+from app.services.query_cache import invalidate_book
+
+
+# Payload fields searches filter on; each gets a keyword index
+INDEXED_PAYLOAD_FIELDS = ("book_id",)
+
+# Points per upsert request; larger uploads are split and sent concurrently
+UPSERT_SHARD_SIZE = 256
+
+# Segment size (KB) at which Qdrant builds the HNSW index; 0 disables indexing.
+# Qdrant's own default, used when the collection doesn't report a value
+DEFAULT_INDEXING_THRESHOLD = 10000
+
+
+def chunk_point_id(chunk_id: str) -> str:
+    """Derive the deterministic Qdrant point ID for a chunk ID."""
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, chunk_id))
 
 
 class QdrantService:
@@ -22,15 +52,36 @@ class QdrantService:
 
     def __init__(self) -> None:
         """Initialize Qdrant client."""
-        self.client: Optional[QdrantClient] = None
-        self.collection_name = settings.qdrant_collection_name
+        self.client: Optional[AsyncQdrantClient] = None
+        self.collection_name = get_settings().qdrant_collection_name
+
+        # Memoized setup state; the collection is assumed to outlive the
+        # process, so a positive answer is cached for its lifetime
+        self._collection_exists = False
+        self._collection_ready = False
 
     async def initialize(self) -> None:
         """Initialize Qdrant client and create collection if needed."""
-        self.client = QdrantClient(
-            url=settings.qdrant_api_endpoint,
-            api_key=settings.qdrant_api_key,
-        )
+        # Async client so Qdrant calls never block the event loop. Extra kwargs
+        # are forwarded to the underlying httpx client, which is created once
+        # and keeps pooled HTTP/2 connections alive
+        if self.client is None:
+            self.client = AsyncQdrantClient(
+                url=get_settings().qdrant_api_endpoint,
+                api_key=get_settings().qdrant_api_key,
+                prefer_grpc=get_settings().qdrant_prefer_grpc,
+                grpc_port=get_settings().qdrant_grpc_port,
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=get_settings().http_max_connections,
+                    max_keepalive_connections=get_settings().http_max_keepalive_connections,
+                    keepalive_expiry=get_settings().http_keepalive_expiry_seconds,
+                ),
+            )
+
+        # Collection setup only runs once per process (ingestion re-initializes)
+        if self._collection_ready:
+            return
 
         # Create collection if it doesn't exist
         if not await self.collection_exists():
@@ -39,15 +90,19 @@ class QdrantService:
         else:
             print(f"OK Qdrant collection exists: {self.collection_name}")
 
+        await self.ensure_payload_indexes()
+        self._collection_ready = True
+
     async def collection_exists(self) -> bool:
         """Check if collection exists."""
         if self.client is None:
             raise RuntimeError("Qdrant client not initialized")
 
-        collections = self.client.get_collections().collections
-        return any(
-            collection.name == self.collection_name for collection in collections
-        )
+        if not self._collection_exists:
+            self._collection_exists = await self.client.collection_exists(
+                self.collection_name
+            )
+        return self._collection_exists
 
     async def create_collection(self) -> None:
         """Create collection for book chunks."""
@@ -58,26 +113,85 @@ class QdrantService:
         # embed-english-v3.0 produces 1024-dimensional vectors
         vector_size = 1024
 
-        self.client.create_collection(
+        await self.client.create_collection(
             collection_name=self.collection_name,
+            # Original vectors and the HNSW graph live on disk (memmapped) so
+            # books larger than RAM fit; the quantized copies below stay in RAM
             vectors_config=VectorParams(
                 size=vector_size,
                 distance=Distance.COSINE,
+                on_disk=True,
+            ),
+            hnsw_config=HnswConfigDiff(on_disk=True),
+            # Payloads (chunk text dominates) are read from disk only for the
+            # final hits; book_id filtering goes through the payload index
+            on_disk_payload=True,
+            optimizers_config=OptimizersConfigDiff(memmap_threshold=20000),
+            # int8 copies kept in RAM cut vector memory traffic 4x;
+            # searches rescore candidates against the original float32 vectors
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True,
+                ),
             ),
         )
+        self._collection_exists = True
+
+    async def ensure_payload_indexes(self) -> None:
+        """Create keyword indexes for filtered payload fields that lack one."""
+        if self.client is None:
+            raise RuntimeError("Qdrant client not initialized")
+
+        # Without an index, book_id filters scan every point's payload
+        info = await self.client.get_collection(self.collection_name)
+        for field_name in INDEXED_PAYLOAD_FIELDS:
+            if field_name not in (info.payload_schema or {}):
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=PayloadSchemaType.KEYWORD,
+                )
+
+    async def get_indexing_threshold(self) -> Optional[int]:
+        """Get the optimizer's current indexing threshold (None if unset)."""
+        if self.client is None:
+            raise RuntimeError("Qdrant client not initialized")
+
+        info = await self.client.get_collection(self.collection_name)
+        return info.config.optimizer_config.indexing_threshold
 
-    async def upsert_chunks(
-        self, points: List[PointStruct]
-    ) -> None:
-        """Upsert chunk vectors to Qdrant."""
+    async def set_indexing_threshold(self, threshold: int) -> None:
+        """Set the optimizer's indexing threshold (0 pauses HNSW indexing)."""
         if self.client is None:
             raise RuntimeError("Qdrant client not initialized")
 
-        self.client.upsert(
+        await self.client.update_collection(
             collection_name=self.collection_name,
-            points=points,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold),
         )
 
+    async def upsert_chunks(self, points: List[PointStruct], *, wait: bool) -> None:
+        """
+        Upsert chunk vectors to Qdrant, sending shards concurrently.
+
+        With wait=False each shard returns once Qdrant has accepted it, before
+        it is applied, so apply errors go unseen and an immediate read may miss
+        the points. Callers must choose explicitly.
+        """
+        if self.client is None:
+            raise RuntimeError("Qdrant client not initialized")
+
+        await asyncio.gather(*(
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=points[i:i + UPSERT_SHARD_SIZE],
+                wait=wait,
+            )
+            for i in range(0, len(points), UPSERT_SHARD_SIZE)
+        ))
+
     async def search(
         self,
         query_vector: List[float],
@@ -96,35 +210,69 @@ class QdrantService:
                 must=[FieldCondition(key="book_id", match=MatchValue(value=book_id))]
             )
 
-        results = self.client.query_points(
+        results = (await self.client.query_points(
             collection_name=self.collection_name,
             query=query_vector,
             limit=limit,
             query_filter=query_filter,
             score_threshold=score_threshold,
-        ).points
+            search_params=SearchParams(
+                quantization=QuantizationSearchParams(rescore=True, oversampling=2.0),
+            ),
+        )).points
 
         return results
 
+    async def retrieve_by_chunk_ids(self, chunk_ids: List[str]) -> List[Record]:
+        """Fetch chunks directly by chunk ID, without a vector search."""
+        if self.client is None:
+            raise RuntimeError("Qdrant client not initialized")
+
+        return await self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[chunk_point_id(chunk_id) for chunk_id in chunk_ids],
+            with_payload=True,
+            with_vectors=False,
+        )
+
     async def delete_by_book(self, book_id: str) -> None:
         """Delete all chunks for a specific book."""
         if self.client is None:
             raise RuntimeError("Qdrant client not initialized")
 
-        self.client.delete(
+        await self.client.delete(
             collection_name=self.collection_name,
             points_selector=Filter(
                 must=[FieldCondition(key="book_id", match=MatchValue(value=book_id))]
             ),
         )
 
+        # Flush cached searches and answers that may cite the deleted chunks
+        invalidate_book(book_id)
+
     async def get_collection_info(self) -> Dict[str, Any]:
         """Get collection information."""
         if self.client is None:
             raise RuntimeError("Qdrant client not initialized")
 
-        return self.client.get_collection(self.collection_name).model_dump()
+        return (await self.client.get_collection(self.collection_name)).model_dump()
+
+    async def close(self) -> None:
+        """Close the Qdrant client and its pooled connections."""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+            self._collection_ready = False
+
+
+@lru_cache(maxsize=1)
+def get_qdrant_service() -> QdrantService:
+    """Get the shared Qdrant service instance, creating it on first use."""
+    return QdrantService()
 
 
-# Global Qdrant service instance
-qdrant_service = QdrantService()
+def __getattr__(attr: str) -> Any:
+    """Resolve the `qdrant_service` global lazily (PEP 562)."""
+    if attr == "qdrant_service":
+        return get_qdrant_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
@@ -0,0 +1,96 @@
+"""
+Result caches for Qdrant queries and chat responses.
+
+Provides LRU + TTL caches over retrieval results and generated chat responses,
+with per-book invalidation so re-ingested or deleted books are never served stale.
+"""
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+import xxhash
+from cachetools import TTLCache
+
+from app.config.settings import get_settings
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for cache keys (case, whitespace, trailing punctuation)."""
+    return " ".join(text.lower().split()).rstrip("?!.,;: ")
+
+
+class QueryCache:
+    """LRU + TTL cache for book-derived results, keyed on request content hash."""
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: int = 300) -> None:
+        """Initialize query cache."""
+        self._cache: TTLCache = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+
+    @staticmethod
+    def make_key(
+        query: str,
+        book_id: Optional[str],
+        top_k: int,
+        score_threshold: Optional[float] = None,
+    ) -> int:
+        """Build cache key from normalized query and search parameters."""
+        raw = f"{normalize_query(query)}|{book_id}|{top_k}|{score_threshold}"
+        return xxhash.xxh3_64_intdigest(raw.encode())
+
+    def get(self, key: int) -> Optional[Any]:
+        """Get cached results, or None on miss/expiry."""
+        entry: Optional[Tuple[Optional[str], Any]] = self._cache.get(key)
+        return entry[1] if entry is not None else None
+
+    def put(self, key: int, book_id: Optional[str], results: Any) -> None:
+        """Store results for a key, tagged with the book they were filtered by."""
+        self._cache[key] = (book_id, results)
+
+    def invalidate(self, book_id: Optional[str] = None) -> None:
+        """Drop entries for a book (and unfiltered searches), or all if None."""
+        if book_id is None:
+            self._cache.clear()
+            return
+
+        # Unfiltered searches span every book, so they are stale as well
+        stale = [
+            key
+            for key, (entry_book_id, _) in self._cache.items()
+            if entry_book_id is None or entry_book_id == book_id
+        ]
+        for key in stale:
+            self._cache.pop(key, None)
+
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> QueryCache:
+    """Get the shared query cache instance, creating it on first use."""
+    settings = get_settings()
+    return QueryCache(
+        max_size=settings.search_cache_size,
+        ttl_seconds=settings.search_cache_ttl_seconds,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> QueryCache:
+    """Get the shared chat response cache instance, creating it on first use."""
+    settings = get_settings()
+    return QueryCache(
+        max_size=settings.response_cache_size,
+        ttl_seconds=settings.response_cache_ttl_seconds,
+    )
+
+
+def invalidate_book(book_id: Optional[str] = None) -> None:
+    """Drop cached searches and chat responses that may cover a book."""
+    get_query_cache().invalidate(book_id)
+    get_response_cache().invalidate(book_id)
+
+
+def __getattr__(attr: str) -> Any:
+    """Resolve the `query_cache` and `response_cache` globals lazily (PEP 562)."""
+    if attr == "query_cache":
+        return get_query_cache()
+    if attr == "response_cache":
+        return get_response_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
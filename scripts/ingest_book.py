@@ -7,29 +7,106 @@ Processes markdown/text book files into searchable chunks with embeddings.
 import argparse
 import asyncio
 import hashlib
+import os
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 import time
-
-from app.config.settings import settings
-from app.services.chunking import ChunkingService, Chunk
-from app.services.cohere_service import cohere_service
-from app.services.qdrant_service import qdrant_service, PointStruct
+from functools import cached_property
+
+import numpy as np
+from tqdm import tqdm
+
+from app.config.settings import get_settings
+from app.services.chunking import ChunkingService, Chunk, chunk_header
+from app.services.cohere_service import get_cohere_service
+from app.services.embedding_cache import EmbeddingCache, get_embedding_cache
+from app.services.qdrant_service import (
+    DEFAULT_INDEXING_THRESHOLD,
+    get_qdrant_service,
+    chunk_point_id,
+    PointStruct,
+)
+from app.services.neon_service import neon_service
 from app.db.connection import DatabaseConnection
 from qdrant_client.models import PointStruct
 
 
+# Chunks per Cohere embed request (the API maximum), capped by total characters
+# to keep request payloads small, and embed requests in flight at once
+EMBED_BATCH_SIZE = 96
+EMBED_BATCH_CHAR_LIMIT = 200_000
+EMBED_CONCURRENCY = 8
+
+# Batches buffered between pipeline stages; bounds resident chunks/embeddings
+PIPELINE_DEPTH = 4
+
+# Files read and chunked concurrently ahead of the embedding stage
+FILE_READ_AHEAD = 8
+
+# Default Qdrant upsert batch size and number of batches in flight
+UPSERT_BATCH_SIZE = 64
+UPSERT_CONCURRENCY = 6
+
+# File types picked up when ingesting a directory
+BOOK_FILE_SUFFIXES = (".md", ".mdx", ".txt")
+
+
+def _positive_int(value: str) -> int:
+    """argparse type for integer options that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _scan_book_files(path: str) -> Iterator[str]:
+    """Recursively yield book file paths under a directory in one walk."""
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                # DirEntry type checks reuse the data readdir already returned
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _scan_book_files(entry.path)
+                elif entry.is_file() and entry.name.endswith(BOOK_FILE_SUFFIXES):
+                    yield entry.path
+    except PermissionError:
+        pass
+
+
 class BookIngestionOrchestrator:
     """Orchestrates book ingestion workflow."""
 
-    def __init__(self, book_path: Path):
+    def __init__(
+        self,
+        book_path: Path,
+        upsert_batch_size: int = UPSERT_BATCH_SIZE,
+        upsert_concurrency: int = UPSERT_CONCURRENCY,
+    ):
         """Initialize orchestrator."""
+        # Zero uploaders would leave embedded batches queued forever
+        if upsert_batch_size < 1:
+            raise ValueError(f"upsert_batch_size must be at least 1, got {upsert_batch_size}")
+        if upsert_concurrency < 1:
+            raise ValueError(f"upsert_concurrency must be at least 1, got {upsert_concurrency}")
+
         self.book_path = Path(book_path)
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_concurrency = upsert_concurrency
         self.chunking_service = ChunkingService()
-        self.chunks: List[Chunk] = []
-        self.book_id: str = ""
         self.total_files = 0
         self.total_chunks = 0
+        self.total_embedded = 0
+        self.total_stored = 0
+
+        # Content key -> future for embeddings currently being requested
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        # Content keys embedded and written to the cache during this run
+        self._stored: Set[bytes] = set()
+
+        # Per-stage progress bars, open while the pipeline runs
+        self._file_bar: Optional[tqdm] = None
+        self._embed_bar: Optional[tqdm] = None
+        self._store_bar: Optional[tqdm] = None
 
     async def ingest(self) -> dict:
         """Run full ingestion workflow."""
@@ -42,24 +119,26 @@ class BookIngestionOrchestrator:
         self.total_files = len(files)
         print(f"Found {self.total_files} files")
 
-        # Step 2: Generate book ID
-        self.book_id = self._generate_book_id()
+        # Step 2: Generate book ID (unless one was assigned up front)
         print(f"Book ID: {self.book_id}")
 
-        # Step 3: Process files and create chunks
-        await self._process_files(files)
+        # Step 3: Prepare the Qdrant collection
+        await self._prepare_collection()
 
-        # Step 4: Generate embeddings
-        print(f"\nGenerating embeddings for {len(self.chunks)} chunks...")
-        await self._generate_embeddings()
+        # Steps 4-6: Chunk, embed and store as a streaming pipeline, so only a
+        # few batches are resident at once and network stages overlap chunking
+        print(f"\nChunking, embedding and storing vectors...")
+        try:
+            await self._run_pipeline(files)
+        except ExceptionGroup as eg:
+            # Surface the first stage failure rather than the group wrapper
+            raise eg.exceptions[0]
+        finally:
+            get_embedding_cache().close()
 
-        # Step 5: Store in Qdrant
-        print(f"Storing vectors in Qdrant...")
-        await self._store_in_qdrant()
-
-        # Step 6: Store metadata in Neon (skip for now - Qdrant is enough)
-        print(f"Skipping Neon metadata storage (Qdrant already has the data)...")
-        # await self._store_metadata()
+        # Neon metadata storage is skipped for now - Qdrant is enough
+        # (re-enable by calling self._store_metadata(chunks) in _upsert_batch)
+        print(f"  Stored total {self.total_stored} vectors in collection: {get_qdrant_service().collection_name}")
 
         elapsed = time.time() - start_time
         print(f"\nIngestion complete in {elapsed:.2f}s")
@@ -78,74 +157,27 @@ class BookIngestionOrchestrator:
         if self.book_path.is_file():
             files = [self.book_path]
         else:
-            files = list(self.book_path.rglob("*.md")) + list(
-                self.book_path.rglob("*.mdx")
-            ) + list(self.book_path.rglob("*.txt"))
+            files = [Path(p) for p in _scan_book_files(str(self.book_path))]
 
         return sorted(files)
 
+    @cached_property
+    def book_id(self) -> str:
+        """Book ID, derived from the path once; assign to override it."""
+        return self._generate_book_id()
+
     def _generate_book_id(self) -> str:
         """Generate unique book ID from path hash."""
         path_str = str(self.book_path.absolute())
         return hashlib.md5(path_str.encode()).hexdigest()
 
-    async def _process_files(self, files: List[Path]) -> None:
-        """Process all files and create chunks."""
-        position = 0
-        errors = []
-
-        for file_path in files:
-            try:
-                print(f"  Processing: {file_path.name}")
-                text = file_path.read_text(encoding="utf-8")
-
-                # Chunk the text
-                chunks = self.chunking_service.chunk_text(text, str(file_path))
-
-                # Update positions
-                for chunk in chunks:
-                    chunk.position = position
-                    position += 1
-
-                self.chunks.extend(chunks)
-                print(f"    Created {len(chunks)} chunks")
-
-            except Exception as e:
-                print(f"    ❌ Error: {e}")
-                errors.append(f"{file_path}: {e}")
-
-        self.total_chunks = len(self.chunks)
-
-        if errors:
-            print(f"\n⚠️  Errors encountered:")
-            for error in errors:
-                print(f"  - {error}")
-
-    async def _generate_embeddings(self) -> None:
-        """Generate embeddings for all chunks."""
-        batch_size = 10
-        batch_texts = [
-            chunk.text for chunk in self.chunks
-        ]
-
-        for i in range(0, len(batch_texts), batch_size):
-            batch = batch_texts[i:i+batch_size]
-            embeddings = await cohere_service.embed_batch(batch)
-
-            # Store embeddings in chunks
-            for j, embedding in enumerate(embeddings):
-                chunk_idx = i + j
-                self.chunks[chunk_idx].embedding = embedding
-
-            print(f"  Processed {min(i+batch_size, len(batch_texts))}/{len(batch_texts)} chunks")
-
-    async def _store_in_qdrant(self) -> None:
-        """Store chunks as vectors in Qdrant."""
+    async def _prepare_collection(self) -> None:
+        """Initialize Qdrant and report current collection usage."""
         # Initialize Qdrant service if needed
-        await qdrant_service.initialize()
+        await get_qdrant_service().initialize()
 
         # Check storage before ingestion (free-tier monitoring)
-        collection_info = await qdrant_service.get_collection_info()
+        collection_info = await get_qdrant_service().get_collection_info()
         current_count = collection_info.get("points_count", 0)
         vector_count = collection_info.get("vectors_count", 0)
 
@@ -159,71 +191,251 @@ class BookIngestionOrchestrator:
             print(f"     Current: {vector_count} vectors (≈{vector_count * 4 / 1024:.1f} MB)")
             print(f"     Free tier limit: ~250K vectors (1 GB)")
 
-        # Create points
-        points = []
-        import uuid
-        for i, chunk in enumerate(self.chunks):
-            # Generate deterministic UUID for point ID
-            point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{self.book_id}-{i}"))
-            point = PointStruct(
-                id=point_id,
-                vector=chunk.embedding,
-                payload={
-                    "book_id": self.book_id,
-                    "chunk_id": f"{self.book_id}-{i}",
-                    "text": chunk.text,
-                    "source_file": chunk.source_file,
-                    "chapter": chunk.chapter,
-                    "section": chunk.section,
-                    "position": chunk.position,
-                },
+    async def _run_pipeline(self, files: List[Path]) -> None:
+        """Stream chunks through embedding and upload stages over bounded queues."""
+        # Each queue item is a batch of chunks; None tells a worker to stop
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        embedded_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+
+        async def embed_stage() -> None:
+            await asyncio.gather(*(
+                self._embedder(chunk_queue, embedded_queue) for _ in range(EMBED_CONCURRENCY)
+            ))
+            for _ in range(self.upsert_concurrency):
+                await embedded_queue.put(None)
+
+        # Pause HNSW indexing during the bulk upload so the graph is built once
+        # at the end rather than incrementally per batch, then restore the
+        # collection's own setting. A threshold already at 0 is left over from
+        # a load that died mid-upload, so it's restored to Qdrant's default.
+        # Concurrent loads into one collection are not supported
+        restore_threshold = (
+            await get_qdrant_service().get_indexing_threshold() or DEFAULT_INDEXING_THRESHOLD
+        )
+        await get_qdrant_service().set_indexing_threshold(0)
+
+        # Throttled progress bars instead of a stdout line per file/batch
+        self._file_bar = tqdm(total=len(files), desc="Chunking", unit="file")
+        self._embed_bar = tqdm(desc="Embedding", unit="chunk")
+        self._store_bar = tqdm(desc="Storing", unit="vector")
+        try:
+            # A failing stage cancels the others instead of leaving them blocked
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._producer(files, chunk_queue))
+                tg.create_task(embed_stage())
+                for _ in range(self.upsert_concurrency):
+                    tg.create_task(self._uploader(embedded_queue))
+        finally:
+            for bar in (self._file_bar, self._embed_bar, self._store_bar):
+                bar.close()
+            await get_qdrant_service().set_indexing_threshold(restore_threshold)
+
+    def _process_one(self, file_path: Path) -> List[Chunk]:
+        """Read and chunk a single file."""
+        # One unbuffered read sized by fstat, decoded in a single pass; skips
+        # the text-mode wrapper and its per-read newline translation
+        with open(file_path, "rb", buffering=0) as f:
+            text = f.read().decode("utf-8")
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return self.chunking_service.chunk_text(text, str(file_path))
+
+    async def _producer(self, files: List[Path], chunk_queue: asyncio.Queue) -> None:
+        """Chunk files and feed fixed-size chunk batches to the embedders."""
+        position = 0
+        batch: List[Chunk] = []
+        batch_chars = 0
+        errors = []
+
+        for start in range(0, len(files), FILE_READ_AHEAD):
+            window = files[start:start + FILE_READ_AHEAD]
+
+            # File reads and tokenization (which releases the GIL) overlap
+            # across worker threads instead of blocking each other
+            results = await asyncio.gather(
+                *(asyncio.to_thread(self._process_one, file_path) for file_path in window),
+                return_exceptions=True,
             )
-            points.append(point)
-
-        # Upsert to Qdrant in batches (smaller batches for reliability)
-        batch_size = 50
-        batches_stored = 0
-        for i in range(0, len(points), batch_size):
-            batch = points[i:i+batch_size]
-            end_idx = min(i+batch_size, len(points))
-            try:
-                await qdrant_service.upsert_chunks(batch)
-                print(f"  Stored batch {end_idx}/{len(points)} vectors")
-                batches_stored += 1
-            except Exception as e:
-                print(f"  Error storing batch {i}-{end_idx}: {e}")
-                # Retry once
-                import asyncio
-                await asyncio.sleep(2)
+
+            for file_path, result in zip(window, results):
+                self._file_bar.update(1)
+                if isinstance(result, Exception):
+                    tqdm.write(f"    ❌ Error in {file_path.name}: {result}")
+                    errors.append(f"{file_path}: {result}")
+                    continue
+
+                # Positions follow file order, so they stay deterministic
+                for chunk in result:
+                    chunk.position = position
+                    position += 1
+
+                    if batch and batch_chars + len(chunk.text) > EMBED_BATCH_CHAR_LIMIT:
+                        await chunk_queue.put(batch)
+                        batch, batch_chars = [], 0
+
+                    batch.append(chunk)
+                    batch_chars += len(chunk.text)
+                    if len(batch) == EMBED_BATCH_SIZE:
+                        await chunk_queue.put(batch)
+                        batch, batch_chars = [], 0
+
+        if batch:
+            await chunk_queue.put(batch)
+        for _ in range(EMBED_CONCURRENCY):
+            await chunk_queue.put(None)
+
+        self.total_chunks = position
+
+        if errors:
+            tqdm.write(f"\n⚠️  Errors encountered:")
+            for error in errors:
+                tqdm.write(f"  - {error}")
+
+    async def _embedder(
+        self, chunk_queue: asyncio.Queue, embedded_queue: asyncio.Queue
+    ) -> None:
+        """Embed chunk batches and pass them, with their vectors, to the uploaders."""
+        cache = get_embedding_cache()
+        model = get_cohere_service().embedding_model
+
+        while (chunks := await chunk_queue.get()) is not None:
+            # Unchanged chunks from earlier runs are served from the persistent
+            # cache; only new or edited text goes to Cohere
+            keys = [EmbeddingCache.make_key(model, chunk.text) for chunk in chunks]
+            # SQLite reads/commits block, so keep them off the event loop
+            cached = await asyncio.to_thread(cache.get_many, keys)
+
+            # Repeated text (boilerplate, snippets) is embedded once per book:
+            # duplicates in the batch collapse to one key, keys another embedder
+            # is still sending or storing are awaited, and keys stored since
+            # our cache read are re-read. Classification happens with no await
+            # in between, so each key is in exactly one of these states
+            missing = {
+                key: chunk.text for key, chunk in zip(keys, chunks) if key not in cached
+            }
+            waiting = {key: self._inflight[key] for key in missing if key in self._inflight}
+            stored = [key for key in missing if key in self._stored]
+            owned = {
+                key: text for key, text in missing.items()
+                if key not in waiting and key not in self._stored
+            }
+
+            if owned:
+                loop = asyncio.get_running_loop()
+                futures = {key: loop.create_future() for key in owned}
+                self._inflight.update(futures)
                 try:
-                    await qdrant_service.upsert_chunks(batch)
-                    print(f"  Retry successful for batch {end_idx}/{len(points)}")
-                    batches_stored += 1
-                except Exception as e2:
-                    print(f"  Retry failed: {e2}")
+                    texts = list(owned.values())
+                    try:
+                        embeddings = await get_cohere_service().embed_batch(texts)
+                    except Exception as e:
+                        tqdm.write(f"  Error embedding chunks {chunks[0].position}-{chunks[-1].position}: {e}")
+                        # Retry once
+                        await asyncio.sleep(2)
+                        embeddings = await get_cohere_service().embed_batch(texts)
+
+                    fresh = list(zip(owned, np.asarray(embeddings, dtype=np.float32)))
+                    for key, vector in fresh:
+                        futures[key].set_result(vector)
+                    await asyncio.to_thread(cache.put_many, fresh)
+                except BaseException:
+                    for future in futures.values():
+                        future.cancel()
                     raise
-            
-        print(f"  Stored total {len(points)} vectors in collection: {qdrant_service.collection_name}")
-
-    async def _store_metadata(self) -> None:
+                finally:
+                    # Once in the cache, a key moves from in-flight to stored
+                    for key in owned:
+                        del self._inflight[key]
+                self._stored.update(owned)
+                cached.update(fresh)
+
+            if stored:
+                cached.update(await asyncio.to_thread(cache.get_many, stored))
+
+            for key, future in waiting.items():
+                cached[key] = await future
+
+            # One contiguous (batch, dim) float32 matrix per batch: ~4 KB per
+            # chunk instead of ~28 KB of boxed floats
+            vectors = np.stack([cached[key] for key in keys])
+
+            self.total_embedded += len(chunks)
+            self._embed_bar.update(len(chunks))
+            await embedded_queue.put((chunks, vectors))
+
+    async def _uploader(self, embedded_queue: asyncio.Queue) -> None:
+        """Collect embedded chunks into upsert-sized batches and store them."""
+        pending: List[Chunk] = []
+        pending_vectors: List[np.ndarray] = []
+        while (item := await embedded_queue.get()) is not None:
+            chunks, vectors = item
+            pending.extend(chunks)
+            pending_vectors.append(vectors)
+            if len(pending) >= self.upsert_batch_size:
+                await self._upsert_batch(pending, np.concatenate(pending_vectors))
+                pending, pending_vectors = [], []
+
+        if pending:
+            await self._upsert_batch(pending, np.concatenate(pending_vectors))
+
+    async def _upsert_batch(self, chunks: List[Chunk], vectors: np.ndarray) -> None:
+        """Upsert one batch of embedded chunks to Qdrant, retrying once."""
+        # Python float lists exist only for the batch being sent; one tolist()
+        # call converts the whole matrix in C
+        points = [
+            self._build_point(chunk, vector)
+            for chunk, vector in zip(chunks, vectors.tolist())
+        ]
+        try:
+            # Wait for Qdrant to apply each shard so apply errors surface here
+            # and the run only reports points that are searchable; with
+            # indexing paused, applying is cheap
+            await get_qdrant_service().upsert_chunks(points, wait=True)
+        except Exception as e:
+            tqdm.write(f"  Error storing chunks {chunks[0].position}-{chunks[-1].position}: {e}")
+            # Retry once
+            await asyncio.sleep(2)
+            try:
+                await get_qdrant_service().upsert_chunks(points, wait=True)
+                tqdm.write(f"  Retry successful for chunks {chunks[0].position}-{chunks[-1].position}")
+            except Exception as e2:
+                tqdm.write(f"  Retry failed: {e2}")
+                raise
+
+        self.total_stored += len(points)
+        self._store_bar.update(len(points))
+
+    def _build_point(self, chunk: Chunk, vector: List[float]) -> PointStruct:
+        """Build the Qdrant point for a chunk of the book."""
+        chunk_id = f"{self.book_id}-{chunk.position}"
+        text = chunk.text
+        return PointStruct(
+            # Deterministic UUID; must stay chunk_point_id so lookups by chunk ID resolve
+            id=chunk_point_id(chunk_id),
+            vector=vector,
+            payload={
+                "book_id": self.book_id,
+                "chunk_id": chunk_id,
+                "text": text,
+                # Citation snippet, precomputed so requests don't re-slice it
+                "text_preview": text[:200] + "..." if len(text) > 200 else text,
+                "source_file": chunk.source_file,
+                "chapter": chunk.chapter,
+                "section": chunk.section,
+                "position": chunk.position,
+                # Prompt-context header, precomputed so requests don't rebuild it
+                "header": chunk_header(chunk.source_file, chunk.chapter),
+            },
+        )
+
+    async def _store_metadata(self, chunks: List[Chunk]) -> None:
         """Store chunk metadata in Neon Postgres."""
         # Initialize connection pool
         await DatabaseConnection.create_pool()
 
-        for i, chunk in enumerate(self.chunks):
-            insert_query = """
-                INSERT INTO chunks_metadata
-                (chunk_id, book_id, source_file, chapter, section, position, text, token_count)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                ON CONFLICT (chunk_id) DO UPDATE SET
-                    text = EXCLUDED.text,
-                    chapter = EXCLUDED.chapter,
-                    section = EXCLUDED.section
-            """
-
-            await DatabaseConnection.execute(
-                insert_query,
-                f"{self.book_id}-{i}",
+        rows = [
+            (
+                f"{self.book_id}-{chunk.position}",
                 self.book_id,
                 chunk.source_file,
                 chunk.chapter,
@@ -232,8 +444,11 @@ class BookIngestionOrchestrator:
                 chunk.text,
                 chunk.token_count,
             )
+            for chunk in chunks
+        ]
+        await neon_service.upsert_chunk_metadata_bulk(rows)
 
-        print(f"  Stored {len(self.chunks)} chunk metadata records in Neon")
+        print(f"  Stored {len(chunks)} chunk metadata records in Neon")
 
 
 async def main():
@@ -247,6 +462,18 @@ async def main():
         required=True,
         help="Path to book directory or file",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=_positive_int,
+        default=UPSERT_BATCH_SIZE,
+        help=f"Points per Qdrant upsert request (default: {UPSERT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=UPSERT_CONCURRENCY,
+        help=f"Qdrant upsert requests in flight (default: {UPSERT_CONCURRENCY})",
+    )
 
     args = parser.parse_args()
     book_path = Path(args.path)
@@ -256,7 +483,11 @@ async def main():
         return
 
     # Run ingestion
-    orchestrator = BookIngestionOrchestrator(book_path)
+    orchestrator = BookIngestionOrchestrator(
+        book_path,
+        upsert_batch_size=args.batch_size,
+        upsert_concurrency=args.concurrency,
+    )
     result = await orchestrator.ingest()
 
     print(f"\n📊 Summary:")
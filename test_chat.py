@@ -1,27 +1,41 @@
-import requests
-import json
-
-url = "http://localhost:8000/api/v1/chat"
-headers = {"Content-Type": "application/json"}
-data = {
-    "query": "What is AI-Native?",
-    "mode": "full_book"
-}
-
-try:
-    print(f"Sending request to {url}...")
-    response = requests.post(url, headers=headers, json=data)
-    print(f"Status Code: {response.status_code}")
-    
-    if response.status_code == 200:
-        result = response.json()
-        print("\nAnswer:")
-        print(result.get("answer"))
-        print("\nCitations:")
-        for cit in result.get("citations", []):
-            print(f"- {cit.get('source')} (Score: {cit.get('score'):.4f})")
-    else:
-        print(f"Error: {response.text}")
-
-except Exception as e:
-    print(f"Exception: {e}")
+import asyncio
+
+import httpx
+
+base_url = "http://localhost:8000"
+queries = [
+    {
+        "query": "What is AI-Native?",
+        "mode": "full_book"
+    },
+]
+
+
+async def send(client: httpx.AsyncClient, data: dict) -> None:
+    try:
+        print(f"Sending request to {base_url}/api/v1/chat...")
+        response = await client.post("/api/v1/chat", json=data)
+        print(f"Status Code: {response.status_code}")
+
+        if response.status_code == 200:
+            result = response.json()
+            print("\nAnswer:")
+            print(result.get("answer"))
+            print("\nCitations:")
+            for cit in result.get("citations", []):
+                print(f"- {cit.get('source')} (Score: {cit.get('score'):.4f})")
+        else:
+            print(f"Error: {response.text}")
+
+    except Exception as e:
+        print(f"Exception: {e}")
+
+
+async def main() -> None:
+    # One pooled client: every query reuses the same keep-alive connection(s)
+    async with httpx.AsyncClient(base_url=base_url, http2=True, timeout=60.0) as client:
+        await asyncio.gather(*(send(client, data) for data in queries))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
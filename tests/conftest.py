@@ -8,10 +8,6 @@ import asyncio
 from typing import AsyncGenerator
 from unittest.mock import AsyncMock, MagicMock
 
-from app.config.settings import settings
-from app.services.qdrant_service import qdrant_service
-from app.services.cohere_service import cohere_service
-
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -21,10 +17,15 @@ def event_loop():
     loop.close()
 
 
-@pytest.fixture
-async def mock_qdrant_service():
+@pytest.fixture(scope="session")
+def mock_qdrant_service():
     """Mock Qdrant service for testing."""
-    service = MagicMock(spec=qdrant_service)
+    # Imported here so collection doesn't load settings or build services
+    from app.config.settings import get_settings
+    from app.services.qdrant_service import QdrantService
+
+    settings = get_settings()
+    service = MagicMock(spec=QdrantService)
     service.collection_name = settings.qdrant_collection_name
     service.initialize = AsyncMock()
     service.collection_exists = AsyncMock(return_value=True)
@@ -35,10 +36,14 @@ async def mock_qdrant_service():
     yield service
 
 
-@pytest.fixture
-async def mock_cohere_service():
+@pytest.fixture(scope="session")
+def mock_cohere_service():
     """Mock Cohere service for testing."""
-    service = MagicMock(spec=cohere_service)
+    from app.config.settings import get_settings
+    from app.services.cohere_service import CohereService
+
+    settings = get_settings()
+    service = MagicMock(spec=CohereService)
     service.embedding_model = settings.embedding_model
     service.chat_model = settings.chat_model
     service.initialize_async = AsyncMock()
@@ -0,0 +1,61 @@
+"""
+Unit tests for chat agents.
+"""
+from app.agents.rag_agent import RAGAgent
+from app.agents.selected_text import SelectedTextAgent
+
+
+class TestSelectedTextAgent:
+    """Test selected-text agent helpers."""
+
+    def test_neighbor_ids_at_first_position(self):
+        """Test that the first chunk has no neighbor before it."""
+        agent = SelectedTextAgent()
+
+        assert agent._neighbor_chunk_ids("book-1-0") == ["book-1-1"]
+
+    def test_neighbor_ids_with_dashed_book_id(self):
+        """Test that dashes in the book ID stay part of the prefix."""
+        agent = SelectedTextAgent()
+
+        assert agent._neighbor_chunk_ids("my-long-book-id-7") == [
+            "my-long-book-id-6",
+            "my-long-book-id-8",
+        ]
+
+    def test_neighbor_ids_for_unrecognized_id(self):
+        """Test that IDs without a numeric position yield no neighbors."""
+        agent = SelectedTextAgent()
+
+        assert agent._neighbor_chunk_ids("book-intro") == []
+        assert agent._neighbor_chunk_ids("42") == []
+
+
+class TestRAGAgent:
+    """Test RAG agent helpers."""
+
+    def test_dedupe_drops_chunk_containing_selection(self):
+        """Test that the hinted chunk, a superset of the selection, is dropped."""
+        agent = RAGAgent()
+        selection = "RAG stands for Retrieval-Augmented Generation."
+        chunks = [
+            {"chunk_id": "book-1-4", "text": "Some earlier context.", "score": 1.0},
+            {"chunk_id": "book-1-5", "text": f"Intro. {selection} More detail.", "score": 1.0},
+            {"chunk_id": "book-1-9", "text": f"Recap: {selection}", "score": 0.8},
+        ]
+
+        unique = agent._dedupe_additional_chunks(selection, chunks, "book-1-5")
+
+        assert [ch["chunk_id"] for ch in unique] == ["book-1-4"]
+
+    def test_dedupe_drops_hinted_chunk_by_id(self):
+        """Test that the hinted chunk is dropped even if its text differs."""
+        agent = RAGAgent()
+        chunks = [
+            {"chunk_id": "book-1-5", "text": "Reworded passage.", "score": 1.0},
+            {"chunk_id": "book-1-6", "text": "Following passage.", "score": 1.0},
+        ]
+
+        unique = agent._dedupe_additional_chunks("Original passage.", chunks, "book-1-5")
+
+        assert [ch["chunk_id"] for ch in unique] == ["book-1-6"]
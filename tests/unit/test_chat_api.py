@@ -0,0 +1,114 @@
+"""
+Unit tests for the chat API endpoints.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from starlette.requests import Request
+
+import app.api.chat as chat_api
+from app.api.chat import chat_unified
+from app.models.chat import ChatRequest, ChatResponse
+from app.services.query_cache import get_response_cache, invalidate_book
+
+
+def make_http_request(if_none_match=None) -> Request:
+    """Build a bare HTTP request carrying an optional If-None-Match header."""
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "POST", "path": "/api/v1/chat", "headers": headers})
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Start every test with an empty response cache."""
+    get_response_cache().invalidate()
+    yield
+    get_response_cache().invalidate()
+
+
+@pytest.fixture
+def generate():
+    """Stub out retrieval and generation with a fixed successful answer."""
+    response = ChatResponse(
+        answer="RAG combines retrieval with generation.",
+        citations=[],
+        mode="rag",
+        chunks_retrieved=0,
+        latency_ms=1.0,
+        model_used="test-chat",
+    )
+    with patch.object(chat_api, "generate_rag_response", AsyncMock(return_value=response)) as mock:
+        yield mock
+
+
+@pytest.mark.asyncio
+class TestChatETag:
+    """Test ETag caching on the unified chat endpoint."""
+
+    async def test_matching_if_none_match_returns_304(self, generate):
+        """Test that a repeat sending the current ETag gets 304 with no body."""
+        request = ChatRequest(query="What is RAG?")
+        first = await chat_unified(request, make_http_request())
+        etag = first.headers["etag"]
+
+        second = await chat_unified(request, make_http_request(f'"other", {etag}'))
+
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert second.body == b""
+        assert second.headers["etag"] == etag
+        generate.assert_awaited_once()
+
+    @pytest.mark.parametrize("if_none_match", ['"stale-etag"', "weak"])
+    async def test_mismatched_or_weak_etag_returns_200(self, generate, if_none_match):
+        """Test that a different or weak ETag gets the full cached body."""
+        request = ChatRequest(query="What is RAG?")
+        first = await chat_unified(request, make_http_request())
+        etag = first.headers["etag"]
+        if if_none_match == "weak":
+            if_none_match = f"W/{etag}"
+
+        second = await chat_unified(request, make_http_request(if_none_match))
+
+        assert second.status_code == 200
+        assert second.body == first.body
+        assert second.headers["etag"] == etag
+        generate.assert_awaited_once()
+
+    async def test_error_response_is_not_cached(self, generate):
+        """Test that a failed request is retried rather than served from cache."""
+        request = ChatRequest(query="What is RAG?")
+        generate.side_effect = [RuntimeError("search failed"), generate.return_value]
+
+        failed = await chat_unified(request, make_http_request())
+        assert "search failed" in failed.answer
+
+        retried = await chat_unified(request, make_http_request())
+        assert retried.status_code == 200
+        assert generate.await_count == 2
+
+    async def test_regenerated_answer_gets_new_etag(self, generate):
+        """Test that a tag for an older answer doesn't validate a new one."""
+        request = ChatRequest(query="What is RAG?", book_id="book-1")
+        first = await chat_unified(request, make_http_request())
+        old_etag = first.headers["etag"]
+
+        # Re-ingesting the book drops its cached answers
+        invalidate_book("book-1")
+        generate.return_value = generate.return_value.model_copy(
+            update={"answer": "RAG grounds answers in retrieved chunks."}
+        )
+        second = await chat_unified(request, make_http_request(old_etag))
+
+        assert second.status_code == 200
+        assert second.headers["etag"] != old_etag
+        assert generate.await_count == 2
+
+    async def test_other_book_invalidation_keeps_answer(self, generate):
+        """Test that invalidating another book leaves a filtered answer cached."""
+        request = ChatRequest(query="What is RAG?", book_id="book-1")
+        await chat_unified(request, make_http_request())
+
+        invalidate_book("book-2")
+        await chat_unified(request, make_http_request())
+
+        generate.assert_awaited_once()
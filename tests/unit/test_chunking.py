@@ -34,6 +34,20 @@ class TestChunkingService:
             # (extract actual overlap verification)
             assert chunks[0].position != chunks[1].position
 
+    def test_overlap_counted_in_tokens(self, chunking_service):
+        """Test that overlap stays within chunk_overlap tokens and the budget."""
+        text = "\n\n".join(
+            " ".join(f"p{i}w{j}" for j in range(20)) for i in range(20)
+        )
+        chunks = chunking_service.chunk_text(text, "test.txt")
+
+        assert len(chunks) > 1
+        for previous, chunk in zip(chunks, chunks[1:]):
+            assert chunk.token_count <= chunking_service.chunk_size
+            overlap = chunk.text.split("\n\n")[0]
+            assert previous.text.endswith(overlap)
+            assert chunking_service._count_text_tokens(overlap) <= chunking_service.chunk_overlap
+
     def test_metadata_extraction(self, chunking_service):
         """Test chapter and section extraction from markdown."""
         text = """# Chapter 1
@@ -60,3 +74,11 @@ More content.
 
         assert all(chunk.source_file == "my_book.md" for chunk in chunks)
         assert all(chunk.position is not None for chunk in chunks)
+
+    def test_chapter_carried_into_later_chunks(self, chunking_service):
+        """Test that chunks without their own header inherit the current chapter."""
+        text = "# Chapter 1\n\n" + "\n\n".join(["word " * 15] * 20)
+        chunks = chunking_service.chunk_text(text, "test.md")
+
+        assert len(chunks) > 1
+        assert all(chunk.chapter == "Chapter 1" for chunk in chunks)
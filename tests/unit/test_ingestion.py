@@ -0,0 +1,139 @@
+"""
+Unit tests for the book ingestion pipeline.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import scripts.ingest_book as ingest_book
+from app.services.embedding_cache import EmbeddingCache
+from scripts.ingest_book import BookIngestionOrchestrator
+
+# Kept before the tests patch asyncio.sleep to skip retry back-off
+real_sleep = asyncio.sleep
+
+
+class FakeCohere:
+    """Cohere stand-in that records every text sent for embedding."""
+
+    embedding_model = "test-embed"
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def embed_batch(self, texts):
+        self.sent.extend(texts)
+        # Yield so concurrent embedders overlap
+        await real_sleep(0.01)
+        if self.fail:
+            raise RuntimeError("embed failed")
+        return [[float(len(text)), 1.0, 0.0, 0.0] for text in texts]
+
+
+@pytest.fixture
+def qdrant():
+    """Qdrant stand-in that records every uploaded point."""
+    service = MagicMock()
+    service.collection_name = "test-collection"
+    service.initialize = AsyncMock()
+    service.get_collection_info = AsyncMock(return_value={})
+    service.get_indexing_threshold = AsyncMock(return_value=20000)
+    service.set_indexing_threshold = AsyncMock()
+    service.points = []
+
+    async def upsert_chunks(points, *, wait):
+        # Ingestion only reports success for points Qdrant has applied
+        assert wait is True
+        await real_sleep(0)
+        service.points.extend(points)
+
+    service.upsert_chunks = AsyncMock(side_effect=upsert_chunks)
+    return service
+
+
+@pytest.fixture
+def book_dir(tmp_path):
+    """Small book where several files repeat the same boilerplate text."""
+    for i in range(12):
+        text = "Shared boilerplate paragraph." if i % 3 == 0 else f"Unique section number {i}."
+        (tmp_path / f"chapter_{i:02d}.md").write_text(text)
+    return tmp_path
+
+
+async def run_ingest(book_dir, qdrant, cohere, **kwargs):
+    """Run ingestion against the stand-in services with small batches."""
+    with patch.object(ingest_book, "get_qdrant_service", return_value=qdrant), \
+            patch.object(ingest_book, "get_cohere_service", return_value=cohere), \
+            patch.object(ingest_book, "get_embedding_cache", return_value=EmbeddingCache(":memory:")), \
+            patch.object(ingest_book, "EMBED_BATCH_SIZE", 2), \
+            patch.object(ingest_book.asyncio, "sleep", AsyncMock()):
+        orchestrator = BookIngestionOrchestrator(book_dir, **kwargs)
+        result = await asyncio.wait_for(orchestrator.ingest(), timeout=10)
+    return orchestrator, result
+
+
+@pytest.mark.asyncio
+class TestIngestionPipeline:
+    """Test the chunk -> embed -> upload pipeline."""
+
+    async def test_positions_and_ids_are_contiguous(self, book_dir, qdrant):
+        """Test that chunk positions and IDs run from 0 without gaps."""
+        orchestrator, result = await run_ingest(
+            book_dir, qdrant, FakeCohere(), upsert_batch_size=3, upsert_concurrency=2
+        )
+
+        payloads = sorted((p.payload for p in qdrant.points), key=lambda p: p["position"])
+        assert [p["position"] for p in payloads] == list(range(result["chunks_created"]))
+        assert [p["chunk_id"] for p in payloads] == [
+            f"{orchestrator.book_id}-{i}" for i in range(result["chunks_created"])
+        ]
+
+    async def test_each_chunk_uploaded_once(self, book_dir, qdrant):
+        """Test that every chunk is upserted exactly once."""
+        orchestrator, result = await run_ingest(
+            book_dir, qdrant, FakeCohere(), upsert_batch_size=3, upsert_concurrency=2
+        )
+
+        ids = [p.id for p in qdrant.points]
+        assert len(ids) == len(set(ids)) == result["chunks_created"]
+        assert orchestrator.total_stored == result["chunks_created"]
+        # Indexing is restored to the collection's own threshold afterwards
+        assert qdrant.set_indexing_threshold.await_args_list[-1].args == (20000,)
+
+    async def test_paused_threshold_is_restored_to_default(self, book_dir, qdrant):
+        """Test that a threshold left at 0 by a crashed load is not kept."""
+        qdrant.get_indexing_threshold.return_value = 0
+
+        await run_ingest(book_dir, qdrant, FakeCohere())
+
+        assert qdrant.set_indexing_threshold.await_args_list[0].args == (0,)
+        assert qdrant.set_indexing_threshold.await_args_list[-1].args == (
+            ingest_book.DEFAULT_INDEXING_THRESHOLD,
+        )
+
+    async def test_duplicate_texts_embedded_once(self, book_dir, qdrant):
+        """Test that repeated chunk text is sent to Cohere only once."""
+        cohere = FakeCohere()
+        await run_ingest(book_dir, qdrant, cohere)
+
+        assert len(cohere.sent) == len(set(cohere.sent))
+        assert set(cohere.sent) == {p.payload["text"] for p in qdrant.points}
+        # Shared chunks still get their own point and the same vector
+        shared = [p for p in qdrant.points if "boilerplate" in p.payload["text"]]
+        assert len(shared) == 4
+        assert all(p.vector == shared[0].vector for p in shared)
+
+    async def test_embed_failure_raises(self, book_dir, qdrant):
+        """Test that an embedding failure aborts the run instead of hanging."""
+        with pytest.raises(RuntimeError, match="embed failed"):
+            await run_ingest(book_dir, qdrant, FakeCohere(fail=True))
+
+        assert qdrant.set_indexing_threshold.await_args_list[-1].args == (20000,)
+
+    async def test_upsert_failure_raises(self, book_dir, qdrant):
+        """Test that an upload failure aborts the run instead of hanging."""
+        qdrant.upsert_chunks.side_effect = RuntimeError("upsert failed")
+
+        with pytest.raises(RuntimeError, match="upsert failed"):
+            await run_ingest(book_dir, qdrant, FakeCohere())
@@ -1,12 +1,16 @@
 """
 Unit tests for service clients.
 """
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 
 from app.services.qdrant_service import QdrantService
 from app.services.cohere_service import CohereService
+from app.services.embed_batcher import EmbedBatcher
+from app.services.embedding_cache import EmbeddingCache
 from app.services.neon_service import NeonService
+from app.services.query_cache import QueryCache
 
 
 @pytest.mark.asyncio
@@ -35,6 +39,55 @@ class TestCohereService:
         assert "api.cohere.ai" in base_url
         assert "compatibility" in base_url
 
+    async def test_cached_embedding_reuse(self):
+        """Test that repeated queries are served from the embedding cache."""
+        service = CohereService()
+        embed_batch = AsyncMock(return_value=[[0.1] * 1024])
+        service.embed_batcher = EmbedBatcher(embed_batch)
+
+        first = await service.get_cached_embedding("What is RAG?")
+        second = await service.get_cached_embedding("  what is rag?  ")
+
+        assert first == second
+        embed_batch.assert_awaited_once()
+
+    async def test_embed_batch_deduplicates_inputs(self):
+        """Test that duplicate texts are embedded once and fanned back out."""
+        service = CohereService()
+        service.async_client = MagicMock()
+        service.async_client.embeddings.create = AsyncMock(
+            return_value=MagicMock(
+                data=[MagicMock(embedding=[1.0]), MagicMock(embedding=[2.0])]
+            )
+        )
+
+        embeddings = await service.embed_batch(["a", "b", "a"])
+
+        assert embeddings == [[1.0], [2.0], [1.0]]
+        assert service.async_client.embeddings.create.call_args.kwargs["input"] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+class TestEmbedBatcher:
+    """Test embedding micro-batcher."""
+
+    async def test_concurrent_submits_share_one_batch(self):
+        """Test that concurrent embed calls are sent as a single batch."""
+        embed_batch = AsyncMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+        batcher = EmbedBatcher(embed_batch, max_batch_size=8, max_wait_ms=5)
+
+        results = await asyncio.gather(*(batcher.submit("x" * n) for n in range(1, 4)))
+
+        assert results == [[1.0], [2.0], [3.0]]
+        embed_batch.assert_awaited_once_with(["x", "xx", "xxx"])
+
+    async def test_batch_error_propagates(self):
+        """Test that a failed batch raises in every waiting caller."""
+        batcher = EmbedBatcher(AsyncMock(side_effect=RuntimeError("boom")))
+
+        with pytest.raises(RuntimeError):
+            await batcher.submit("query")
+
 
 @pytest.mark.asyncio
 class TestNeonService:
@@ -60,3 +113,80 @@ class TestNeonService:
 
             # Verify execute was called
             assert mock_exec.called
+
+    async def test_metadata_bulk_upsert(self):
+        """Test that bulk upsert sends all rows in one executemany call."""
+        service = NeonService()
+        rows = [
+            (f"test-chunk-{i}", "book-1", "test.md", "Chapter 1", None, i, "Test content", 10)
+            for i in range(3)
+        ]
+
+        from unittest.mock import patch
+        with patch("app.services.neon_service.DatabaseConnection.executemany") as mock_exec:
+            await service.upsert_chunk_metadata_bulk(rows)
+
+            mock_exec.assert_called_once()
+            assert mock_exec.call_args.args[1] == rows
+
+    async def test_metadata_bulk_upsert_uses_copy_for_large_batches(self):
+        """Test that large batches are loaded through COPY and merged."""
+        from app.services.neon_service import COPY_MIN_ROWS
+        service = NeonService()
+        rows = [
+            (f"test-chunk-{i}", "book-1", "test.md", None, None, i, "Test content", 10)
+            for i in range(COPY_MIN_ROWS)
+        ]
+
+        from unittest.mock import patch
+        with patch("app.services.neon_service.DatabaseConnection.copy_and_merge") as mock_copy:
+            await service.upsert_chunk_metadata_bulk(rows)
+
+            mock_copy.assert_called_once()
+            assert mock_copy.call_args.args[2] == rows
+
+
+class TestQueryCache:
+    """Test search result cache."""
+
+    def test_key_normalization(self):
+        """Test that keys ignore case, whitespace and trailing punctuation."""
+        assert QueryCache.make_key("What is RAG?", "book-1", 5) == QueryCache.make_key(
+            " what is rag? ", "book-1", 5
+        )
+        assert QueryCache.make_key("What  is RAG?", "book-1", 5) == QueryCache.make_key(
+            "what is rag ?", "book-1", 5
+        )
+        assert QueryCache.make_key("What is RAG?", "book-1", 5) != QueryCache.make_key(
+            "What is RAG?", "book-2", 5
+        )
+
+    def test_invalidate_by_book(self):
+        """Test that invalidation drops the book's and unfiltered entries only."""
+        cache = QueryCache(max_size=10, ttl_seconds=60)
+        cache.put(b"a", "book-1", ["a"])
+        cache.put(b"b", "book-2", ["b"])
+        cache.put(b"all", None, ["all"])
+
+        cache.invalidate("book-1")
+
+        assert cache.get(b"a") is None
+        assert cache.get(b"all") is None
+        assert cache.get(b"b") == ["b"]
+
+
+class TestEmbeddingCache:
+    """Test persistent embedding cache."""
+
+    def test_round_trip_and_misses(self):
+        """Test that stored embeddings come back as float32 and misses are omitted."""
+        cache = EmbeddingCache(":memory:")
+        hit = EmbeddingCache.make_key("model", "cached text")
+        miss = EmbeddingCache.make_key("model", "new text")
+
+        cache.put_many([(hit, [0.5, 1.5])])
+        result = cache.get_many([hit, miss])
+
+        assert list(result) == [hit]
+        assert result[hit].dtype == "float32"
+        assert result[hit].tolist() == [0.5, 1.5]